@@ -1,14 +1,28 @@
 import logging
+from itertools import islice
 from .data_fetcher import (
     get_cost_by_service, get_idle_ec2_instances, get_untagged_resources,
-    get_ebs_optimization_candidates, get_daily_cost_history, get_s3_bucket_analysis
+    get_ebs_optimization_candidates, get_daily_cost_history, get_s3_bucket_analysis,
+    clear_inventory_cache, _utc_today
 )
-import numpy as np
 from .aws_connector import AWS_REGION
+from .cache import invalidate as invalidate_response_cache
+from .utils import ttl_cache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
+# --- Constants for result caching ---
+# Cost Explorer data has daily granularity (and each request is billed), so cache for a day;
+# entries are also bucketed on the UTC date (see _cost_day), so they never outlive it
+COST_CACHE_TTL_SECONDS = 86400
+# EC2/EBS inventory changes on a scale of minutes
+INVENTORY_CACHE_TTL_SECONDS = 300
+
+def _cost_day():
+    """Helper function returning the UTC date the Cost Explorer windows end on, used to bucket cost results."""
+    return _utc_today()
+
+@ttl_cache(COST_CACHE_TTL_SECONDS, bucket=_cost_day)
 def analyze_cost_data(days=30):
     """
     Analyzes cost data by fetching it from the data_fetcher.
@@ -20,15 +34,16 @@ def analyze_cost_data(days=30):
     Returns:
         dict: A dictionary of costs by service, or None if fetching fails.
     """
-    logging.info(f"Starting cost data analysis for the last {days} days.")
+    logger.info("Starting cost data analysis for the last %d days.", days)
     cost_data = get_cost_by_service(days=days)
     if cost_data is None:
-        logging.error("Failed to retrieve cost data for analysis.")
+        logger.error("Failed to retrieve cost data for analysis.")
         return None
     # Future: Add more complex analysis here if needed (e.g., trend detection)
-    logging.info("Cost data analysis complete.")
+    logger.info("Cost data analysis complete.")
     return cost_data
 
+@ttl_cache(INVENTORY_CACHE_TTL_SECONDS)
 def analyze_idle_instances(region=AWS_REGION):
     """
     Analyzes EC2 instances to find idle ones by fetching data from data_fetcher.
@@ -40,15 +55,16 @@ def analyze_idle_instances(region=AWS_REGION):
     Returns:
         list: A list of potentially idle instances, or None if fetching fails.
     """
-    logging.info(f"Starting idle instance analysis for region {region}.")
+    logger.info("Starting idle instance analysis for region %s.", region)
     idle_instances = get_idle_ec2_instances(region=region)
     if idle_instances is None:
-        logging.error("Failed to retrieve idle instance data for analysis.")
+        logger.error("Failed to retrieve idle instance data for analysis.")
         return None
     # Future: Add more complex analysis or filtering here if needed
-    logging.info(f"Idle instance analysis complete. Found {len(idle_instances)} potential candidates.")
+    logger.info("Idle instance analysis complete. Found %d potential candidates.", len(idle_instances))
     return idle_instances
 
+@ttl_cache(INVENTORY_CACHE_TTL_SECONDS)
 def analyze_untagged_resources(required_tags=None, region=AWS_REGION):
     """
     Analyzes resources to find untagged ones by fetching data from data_fetcher.
@@ -63,15 +79,17 @@ def analyze_untagged_resources(required_tags=None, region=AWS_REGION):
         dict: A dictionary containing lists of untagged 'Instances' and 'Volumes',
               or None if fetching fails.
     """
-    logging.info(f"Starting untagged resource analysis for region {region}.")
+    logger.info("Starting untagged resource analysis for region %s.", region)
     untagged_resources = get_untagged_resources(required_tags=required_tags, region=region)
     if untagged_resources is None:
-        logging.error("Failed to retrieve untagged resource data for analysis.")
+        logger.error("Failed to retrieve untagged resource data for analysis.")
         return None
     # Future: Add more complex analysis or filtering here if needed
-    logging.info(f"Untagged resource analysis complete. Found {len(untagged_resources.get('Instances',[]))} instances, {len(untagged_resources.get('Volumes',[]))} volumes.")
+    logger.info("Untagged resource analysis complete. Found %d instances, %d volumes.",
+                len(untagged_resources.get('Instances', [])), len(untagged_resources.get('Volumes', [])))
     return untagged_resources
 
+@ttl_cache(INVENTORY_CACHE_TTL_SECONDS)
 def analyze_ebs_optimization(region=AWS_REGION):
     """
     Analyzes EBS volumes to find optimization candidates using data_fetcher.
@@ -84,15 +102,52 @@ def analyze_ebs_optimization(region=AWS_REGION):
         dict: A dictionary containing lists of 'UnattachedVolumes' and 'Gp2Volumes',
               or None if fetching fails.
     """
-    logging.info(f"Starting EBS optimization analysis for region {region}.")
+    logger.info("Starting EBS optimization analysis for region %s.", region)
     ebs_opts = get_ebs_optimization_candidates(region=region)
     if ebs_opts is None:
-        logging.error("Failed to retrieve EBS optimization data for analysis.")
+        logger.error("Failed to retrieve EBS optimization data for analysis.")
         return None
     # Future: Add more complex analysis (e.g., cost comparison for gp2->gp3)
-    logging.info(f"EBS optimization analysis complete. Found {len(ebs_opts.get('UnattachedVolumes',[]))} unattached, {len(ebs_opts.get('Gp2Volumes',[]))} gp2 volumes.")
+    logger.info("EBS optimization analysis complete. Found %d unattached, %d gp2 volumes.",
+                len(ebs_opts.get('UnattachedVolumes', [])), len(ebs_opts.get('Gp2Volumes', [])))
     return ebs_opts
 
+def clear_caches():
+    """
+    Drops every in-process cached result (analyzer results and the shared EC2/EBS scans)
+    and marks the on-disk response cache stale, so the next request fetches fresh data from AWS.
+    """
+    for analyzer in (analyze_cost_data, analyze_idle_instances, analyze_untagged_resources,
+                     analyze_ebs_optimization, analyze_cost_anomalies):
+        analyzer.cache_clear()
+    clear_inventory_cache()
+    invalidate_response_cache()
+    logger.info("Cleared cached analyzer results and EC2/EBS inventory.")
+
+def _welford_stats(values):
+    """
+    Computes the mean and population standard deviation of a series in one pass.
+
+    Welford's algorithm is numerically stable and never builds an intermediate
+    array, so it works directly on dict views and iterators.
+
+    Args:
+        values (iterable): Numeric values (at least one).
+
+    Returns:
+        tuple: (mean, std_dev), with std_dev matching numpy's np.std default.
+    """
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for value in values:
+        n += 1
+        delta = value - mean
+        mean += delta / n
+        m2 += delta * (value - mean)
+    return mean, (m2 / n) ** 0.5
+
+@ttl_cache(COST_CACHE_TTL_SECONDS, bucket=_cost_day)
 def analyze_cost_anomalies(history_days=60, std_dev_threshold=2.5):
     """
     Analyzes daily cost history to find anomalies (significant spikes).
@@ -110,28 +165,20 @@ def analyze_cost_anomalies(history_days=60, std_dev_threshold=2.5):
                         'average_cost': 100.0, 'std_dev': 15.0,
                         'threshold': 137.5, 'is_anomaly': True}
     """
-    logging.info(f"Starting cost anomaly analysis using last {history_days} days.")
+    logger.info("Starting cost anomaly analysis using last %d days.", history_days)
     daily_costs = get_daily_cost_history(days=history_days)
 
     if daily_costs is None or len(daily_costs) < 2: # Need at least 2 points for std dev
-        logging.error("Insufficient daily cost data for anomaly analysis.")
+        logger.error("Insufficient daily cost data for anomaly analysis.")
         return None
 
-    # Convert costs to a list/array for calculation
-    costs = list(daily_costs.values())
-    dates = list(daily_costs.keys())
-
-    # Use all but the most recent day for calculating baseline mean/std dev
-    if len(costs) > 1:
-        baseline_costs = np.array(costs[:-1])
-        average_cost = np.mean(baseline_costs)
-        std_dev = np.std(baseline_costs)
-    else: # Handle edge case with only 1 day (cannot calculate baseline)
-        average_cost = costs[0]
-        std_dev = 0
+    # daily_costs is ordered by date, so the latest day is the last key
+    latest_date = next(reversed(daily_costs))
+    latest_cost = daily_costs[latest_date]
 
-    latest_date = dates[-1]
-    latest_cost = costs[-1]
+    # Use all but the most recent day for calculating baseline mean/std dev.
+    n_baseline = len(daily_costs) - 1
+    average_cost, std_dev = _welford_stats(islice(daily_costs.values(), n_baseline))
 
     # Calculate the anomaly threshold
     anomaly_threshold = average_cost + (std_dev * std_dev_threshold)
@@ -142,18 +189,18 @@ def analyze_cost_anomalies(history_days=60, std_dev_threshold=2.5):
     result = {
         'latest_date': latest_date,
         'latest_cost': latest_cost,
-        'average_cost': round(average_cost, 2),
-        'std_dev': round(std_dev, 2),
-        'threshold': round(anomaly_threshold, 2),
+        'average_cost': average_cost,
+        'std_dev': std_dev,
+        'threshold': anomaly_threshold,
         'is_anomaly': is_anomaly,
         'history_days': history_days,
         'std_dev_threshold': std_dev_threshold
     }
 
     if is_anomaly:
-        logging.warning(f"Cost anomaly detected! Date: {latest_date}, Cost: ${latest_cost:.2f}, Threshold: ${anomaly_threshold:.2f}")
+        logger.warning("Cost anomaly detected! Date: %s, Cost: $%.2f, Threshold: $%.2f", latest_date, latest_cost, anomaly_threshold)
     else:
-        logging.info("No cost anomaly detected.")
+        logger.info("No cost anomaly detected (baseline of %d days).", n_baseline)
 
     return result
 
@@ -167,12 +214,12 @@ def analyze_s3_optimization(region=None):
     Returns:
         dict: Dictionary containing S3 analysis results or None if analysis fails.
     """
-    logging.info("Starting S3 optimization analysis.")
+    logger.info("Starting S3 optimization analysis.")
     
     # Fetch S3 bucket data
     s3_data = get_s3_bucket_analysis(region)
     if s3_data is None:
-        logging.error("Failed to retrieve S3 bucket data for analysis.")
+        logger.error("Failed to retrieve S3 bucket data for analysis.")
         return None
     
     try:
@@ -185,11 +232,12 @@ def analyze_s3_optimization(region=None):
             'cost_analysis': _calculate_s3_cost_impact(s3_data)
         }
         
-        logging.info(f"S3 analysis complete. Found {len(s3_data['optimization_opportunities'])} optimization opportunities across {s3_data['summary']['buckets_analyzed']} buckets.")
+        logger.info("S3 analysis complete. Found %d optimization opportunities across %d buckets.",
+                    len(s3_data['optimization_opportunities']), s3_data['summary']['buckets_analyzed'])
         return analysis_result
         
     except Exception as e:
-        logging.error(f"Error during S3 analysis: {str(e)}")
+        logger.error("Error during S3 analysis: %s", e)
         return None
 
 def _prioritize_s3_recommendations(s3_data):
@@ -305,7 +353,8 @@ def _calculate_s3_cost_impact(s3_data):
 
 # Example usage (optional, for testing this module directly)
 if __name__ == '__main__':
-    logging.info("--- Testing Analyzer ---")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info("--- Testing Analyzer ---")
 
     print("\nAnalyzing Cost Data...")
     costs = analyze_cost_data(days=7)
@@ -362,4 +411,4 @@ if __name__ == '__main__':
         print("Could not perform cost anomaly analysis.")
 
 
-    logging.info("--- Analyzer Test Complete ---")
\ No newline at end of file
+    logger.info("--- Analyzer Test Complete ---")
\ No newline at end of file
@@ -1,14 +1,55 @@
+import logging
 import os
-from flask import Flask, render_template, jsonify
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from flask import Flask, render_template, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 from .analyzer import (
     analyze_cost_data, analyze_idle_instances, analyze_untagged_resources,
-    analyze_ebs_optimization, analyze_cost_anomalies, analyze_s3_optimization
+    analyze_ebs_optimization, analyze_cost_anomalies, analyze_s3_optimization,
+    clear_caches
 )
+from .aws_connector import warm_clients
+from .cache import stats as cache_stats
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
+# Configure logging once for the whole application; library modules only create loggers
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, a C-accelerated encoder, so that large
+    untagged-resource and EBS payloads are cheap to serialize. Types orjson does not
+    support natively (e.g. Decimal) fall back to Flask's default conversions.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype=self.mimetype)
+
+    def _encode(self, obj):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+# templates/ and static/ live at the repository root, one level above this package
+app = Flask(__name__, template_folder='../templates', static_folder='../static')
+app.json = ORJSONProvider(app)
+
+# Warm the boto3 session and clients when the app is loaded rather than on the first request.
+# This runs at import so it also happens under `flask run`, gunicorn and other WSGI servers;
+# set AWS_WARM_CLIENTS=0 to keep importing the app side-effect free (the test suite does).
+if os.getenv('AWS_WARM_CLIENTS', '1').strip().lower() in ('1', 'true', 'yes'):
+    warm_clients()
 
 # Removed dummy data definitions
 
@@ -70,6 +111,38 @@ def get_s3_optimization_api():
         return jsonify({"error": "Failed to retrieve S3 optimization data"}), 500
     return jsonify(s3_data)
 
+@app.route('/api/cache-stats')
+def get_cache_stats_api():
+    """API endpoint exposing the on-disk response cache mode, counters and entry count."""
+    return jsonify(cache_stats())
+
+@app.route('/api/dashboard')
+def get_dashboard_api():
+    """
+    API endpoint that runs every analyzer concurrently and returns all dashboard sections.
+    Pass ?refresh=1 to drop cached results first and fetch everything from AWS again.
+    """
+    if request.args.get('refresh', '').lower() in ('1', 'true', 'yes'):
+        clear_caches()
+    analyzers = {
+        'cost_by_service': analyze_cost_data,
+        'idle_instances': analyze_idle_instances,
+        'untagged_resources': analyze_untagged_resources,
+        'ebs_optimization': analyze_ebs_optimization,
+        'cost_anomalies': analyze_cost_anomalies,
+        's3_optimization': analyze_s3_optimization,
+    }
+    # The analyzers are independent and block on AWS API round trips, so running them
+    # in threads brings the response time down to that of the slowest analyzer.
+    with ThreadPoolExecutor(max_workers=len(analyzers)) as executor:
+        futures = {name: executor.submit(analyzer) for name, analyzer in analyzers.items()}
+        dashboard_data = {name: future.result() for name, future in futures.items()}
+
+    # Sections whose analyzer failed are returned as null; only fail the request if all did
+    if all(data is None for data in dashboard_data.values()):
+        return jsonify({"error": "Failed to retrieve dashboard data"}), 500
+    return jsonify(dashboard_data)
+
 if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 'yes')
     app.run(debug=debug_mode)
\ No newline at end of file
@@ -1,10 +1,11 @@
 import boto3
 import os
+import threading
+from botocore.config import Config
 from dotenv import load_dotenv
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,6 +17,23 @@ AWS_REGION = os.getenv("AWS_REGION", "us-east-1") # Default to us-east-1 if not
 
 # Module-level variable to hold the session once created
 _session = None
+# Clients keyed by (service_name, region). Building a client parses the service model,
+# so each one is created once and shared; boto3 clients are thread-safe, but Sessions
+# are not, so creation happens under a lock.
+_CLIENT_CACHE = {}
+_client_lock = threading.Lock()
+# Shared client configuration: a connection pool large enough for the threaded
+# per-AZ / per-service fan-out, adaptive retries that back off on throttling, and
+# TCP keepalive so pooled connections survive the gaps between dashboard refreshes.
+# The pool is per client, so it should stay at least as large as the busiest thread
+# fan-out sharing one client (e.g. AWS_FETCH_WORKERS).
+MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+CLIENT_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    user_agent_extra='cost-opt-dash/1'
+)
 def get_aws_session():
     """
     Returns the Boto3 session, creating it lazily if it doesn't exist.
@@ -23,14 +41,14 @@ def get_aws_session():
     """
     global _session
     if _session is None:
-        logging.info("Creating new AWS session...")
+        logger.info("Creating new AWS session...")
         # Fetch credentials again inside the function to ensure they are current
         aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
         aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
         aws_region = os.getenv("AWS_REGION", "us-east-1")
 
         if not aws_access_key_id or not aws_secret_access_key:
-            logging.error("AWS credentials (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY) not found in environment variables during session creation.")
+            logger.error("AWS credentials (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY) not found in environment variables during session creation.")
             # Cannot create a session without credentials
             return None
         else:
@@ -40,19 +58,20 @@ def get_aws_session():
                     aws_secret_access_key=aws_secret_access_key,
                     region_name=aws_region
                 )
-                logging.info(f"AWS session created successfully for region {aws_region}.")
+                logger.info("AWS session created successfully for region %s.", aws_region)
             except Exception as e:
-                logging.error(f"Failed to create AWS session: {e}")
+                logger.error("Failed to create AWS session: %s", e)
                 _session = None # Ensure it remains None on failure
 
     if _session is None:
-         logging.warning("Attempting to get AWS session, but it could not be initialized successfully.")
+         logger.warning("Attempting to get AWS session, but it could not be initialized successfully.")
 
     return _session
 
 def get_client(service_name, region_name=None):
     """
     Gets a Boto3 client for the specified service.
+    Clients are cached per (service, region) and shared across threads.
 
     Args:
         service_name (str): The name of the AWS service (e.g., 'ec2', 'ce', 'cloudwatch').
@@ -63,31 +82,56 @@ def get_client(service_name, region_name=None):
     """
     session = get_aws_session()
     if not session:
-        logging.error(f"Cannot get client for '{service_name}': AWS session is invalid.")
+        logger.error("Cannot get client for '%s': AWS session is invalid.", service_name)
         return None
+
+    key = (service_name, region_name or AWS_REGION)
+    client = _CLIENT_CACHE.get(key)
+    if client is not None:
+        return client
+
     try:
-        client = session.client(service_name, region_name=region_name or AWS_REGION)
-        logging.debug(f"Successfully obtained client for '{service_name}' in region '{region_name or AWS_REGION}'.")
+        with _client_lock:
+            client = _CLIENT_CACHE.get(key) # Another thread may have created it meanwhile
+            if client is None:
+                client = session.client(service_name, region_name=key[1], config=CLIENT_CONFIG)
+                _CLIENT_CACHE[key] = client
+        logger.debug("Successfully obtained client for '%s' in region '%s'.", service_name, key[1])
         return client
     except Exception as e:
-        logging.error(f"Failed to get client for '{service_name}': {e}")
+        logger.error("Failed to get client for '%s': %s", service_name, e)
         return None
 
+def warm_clients(services=('ce', 'ec2', 'cloudwatch', 's3'), region_name=None):
+    """
+    Creates the AWS session and the clients used by the dashboard ahead of time,
+    so the first API request does not pay for session and client construction.
+    Failures (e.g. no credentials in a dev environment) are logged by get_client
+    and otherwise ignored.
+
+    Args:
+        services (tuple): The AWS services to create clients for.
+        region_name (str, optional): The region for the clients. Defaults to AWS_REGION.
+    """
+    for service_name in services:
+        get_client(service_name, region_name)
+
 # Example usage (optional, for testing this module directly)
 if __name__ == '__main__':
-    logging.info("Attempting to get clients...")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info("Attempting to get clients...")
     ce_client = get_client('ce') # Cost Explorer client
     ec2_client = get_client('ec2') # EC2 client
     cw_client = get_client('cloudwatch') # CloudWatch client
 
     if ce_client:
-        logging.info("Cost Explorer client obtained.")
+        logger.info("Cost Explorer client obtained.")
     if ec2_client:
-        logging.info("EC2 client obtained.")
+        logger.info("EC2 client obtained.")
     if cw_client:
-        logging.info("CloudWatch client obtained.")
+        logger.info("CloudWatch client obtained.")
 
     # Attempt to get the session to trigger initialization if needed
     session = get_aws_session()
     if not session:
-        logging.warning("AWS Session could not be initialized. Check .env file and credentials.")
\ No newline at end of file
+        logger.warning("AWS Session could not be initialized. Check .env file and credentials.")
\ No newline at end of file
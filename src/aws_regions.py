@@ -1,7 +1,7 @@
 # aws_regions.py
-# A list of available AWS regions
+# A tuple of available AWS regions (immutable, so it can be shared safely)
 
-AWS_REGIONS = [
+AWS_REGIONS = (
     "us-east-1",
     "us-east-2",
     "us-west-1",
@@ -16,4 +16,7 @@ AWS_REGIONS = [
     "ca-central-1",
     "sa-east-1"
     # Add more regions as needed
-]
\ No newline at end of file
+)
+
+# Use for O(1) validation of user-supplied regions: `if region in AWS_REGIONS_SET`
+AWS_REGIONS_SET = frozenset(AWS_REGIONS)
@@ -0,0 +1,217 @@
+# cache.py
+# Opt-in on-disk cache for AWS API responses and fetcher results, stored as orjson in a local SQLite file
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import orjson
+
+from .utils import PartialResult
+
+logger = logging.getLogger(__name__)
+
+# Supported values for the COST_CACHE_MODE environment variable:
+#   off      - never touch the cache (default)
+#   on       - serve fresh entries, store new responses
+#   readonly - serve fresh entries, never write
+#   replay   - serve any stored entry regardless of age and never call AWS;
+#              a request that was not recorded raises CacheMiss
+# Setting AWS_OPT_CACHE_DISABLE=1 forces 'off' whatever COST_CACHE_MODE says (e.g. in CI).
+CACHE_MODES = ('off', 'on', 'readonly', 'replay')
+DEFAULT_CACHE_PATH = '.aws_cache.sqlite3'
+
+_write_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0}
+# time.time() of the last invalidate(); entries stored before it are treated as stale
+_invalidated_at = 0.0
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def cache_mode():
+    """Returns the active cache mode from COST_CACHE_MODE, falling back to 'off' for unknown values."""
+    if os.getenv('AWS_OPT_CACHE_DISABLE', '').strip().lower() in ('1', 'true', 'yes'):
+        return 'off'
+    mode = os.getenv('COST_CACHE_MODE', 'off').strip().lower()
+    if mode not in CACHE_MODES:
+        logger.warning("Unknown COST_CACHE_MODE '%s'; response cache disabled.", mode)
+        return 'off'
+    return mode
+
+
+def make_key(namespace, params):
+    """
+    Builds a stable cache key for an API request.
+
+    Args:
+        namespace (str): Identifies the API operation, e.g. 'ce:GetCostAndUsage'.
+        params (dict): The request parameters.
+
+    Returns:
+        str: Hex SHA-256 of the namespace and the canonical JSON form of params.
+    """
+    canonical = orjson.dumps(params, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(namespace.encode() + b'|' + canonical).hexdigest()
+
+
+def invalidate():
+    """
+    Marks every stored response as stale, so later lookups refetch from AWS (and store the fresh result).
+
+    Rows are kept rather than deleted: replay mode ignores age and can still serve them.
+    """
+    global _invalidated_at
+    _invalidated_at = time.time()
+    logger.info("Response cache invalidated; entries stored before now will be refetched.")
+
+
+def _count(stat):
+    """Helper function to bump one of the stats() counters."""
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def _connect():
+    """Helper function to open the cache database, creating the table on first use."""
+    conn = sqlite3.connect(os.getenv('COST_CACHE_PATH', DEFAULT_CACHE_PATH), timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL NOT NULL, value BLOB NOT NULL)"
+    )
+    return conn
+
+
+def _load(key, ttl):
+    """
+    Helper function returning the stored value for key, or None if absent, older than ttl
+    or stored before the last invalidate() (ttl=None accepts any entry).
+    """
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+    finally:
+        conn.close()
+    if row is None or (ttl is not None and (time.time() - row[0] >= ttl or row[0] < _invalidated_at)):
+        return None
+    return orjson.loads(row[1])
+
+
+def _store(key, value):
+    """Helper function to insert or replace a stored value."""
+    with _write_lock:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, created, value) VALUES (?, ?, ?)",
+                    (key, time.time(), orjson.dumps(value))
+                )
+        finally:
+            conn.close()
+
+
+def cached_call(namespace, params, ttl, fetch):
+    """
+    Returns a cached response for (namespace, params), calling fetch() on a miss.
+
+    Behaviour follows cache_mode() (see CACHE_MODES). Cache read/write errors
+    are logged and treated as misses so a broken cache file never breaks a fetch.
+    None results and PartialResult values (a failed part of the fetch) are never stored.
+
+    Args:
+        namespace (str): Identifies the API operation.
+        params (dict): The request parameters; part of the cache key.
+        ttl (float): How long a stored response stays fresh, in seconds.
+        fetch (callable): Performs the real API call; must return JSON-serializable data.
+
+    Returns:
+        The cached or freshly fetched response.
+    """
+    mode = cache_mode()
+    if mode == 'off':
+        return fetch()
+
+    key = make_key(namespace, params)
+    try:
+        value = _load(key, None if mode == 'replay' else ttl)
+    except sqlite3.Error as e:
+        logger.warning("Response cache read failed for %s: %s", namespace, e)
+        _count('errors')
+        value = None
+    if value is not None:
+        logger.debug("Response cache hit for %s.", namespace)
+        _count('hits')
+        return value
+    _count('misses')
+
+    if mode == 'replay':
+        raise CacheMiss(f"No recorded response for {namespace} in replay mode.")
+
+    value = fetch()
+    if mode == 'on' and value is not None and not isinstance(value, PartialResult):
+        try:
+            _store(key, value)
+            _count('writes')
+        except sqlite3.Error as e:
+            logger.warning("Response cache write failed for %s: %s", namespace, e)
+            _count('errors')
+    return value
+
+
+def cached(ttl):
+    """
+    Decorator that stores a fetcher's result in the on-disk cache for ttl seconds.
+
+    The key is the function's qualified name plus its arguments; use
+    invalidate() to force a refetch. A replay-mode miss is logged and returns None, matching the fetchers'
+    convention for a failed fetch.
+
+    Args:
+        ttl (float): How long a stored result stays fresh, in seconds.
+    """
+    def decorator(func):
+        namespace = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return cached_call(
+                    namespace, {'args': args, 'kwargs': kwargs}, ttl,
+                    lambda: func(*args, **kwargs)
+                )
+            except CacheMiss as e:
+                logger.error("%s", e)
+                return None
+
+        return wrapper
+    return decorator
+
+
+def stats():
+    """
+    Returns cache counters for observability.
+
+    Returns:
+        dict: 'mode', this process's 'hits', 'misses', 'writes' and 'errors',
+              and the number of stored 'entries' (None if the cache is off or unreadable).
+    """
+    with _stats_lock:
+        result = dict(_stats)
+    result['mode'] = cache_mode()
+    result['entries'] = None
+    if result['mode'] != 'off':
+        try:
+            conn = _connect()
+            try:
+                result['entries'] = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Could not read response cache size: %s", e)
+    return result
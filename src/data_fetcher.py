@@ -1,11 +1,15 @@
+import functools
 import logging
-from datetime import datetime, timedelta
-import pandas as pd
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from .aws_connector import get_client, AWS_REGION
 from .aws_regions import AWS_REGIONS
+from .cache import cached, cached_call
+from .utils import PartialResult, ttl_cache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # --- Constants for Idle Instance Detection ---
 # How far back to look for metrics (e.g., 14 days)
@@ -17,13 +21,40 @@ IDLE_MAX_CPU_THRESHOLD = 10.0
 # CloudWatch metric details
 METRIC_NAME = 'CPUUtilization'
 NAMESPACE = 'AWS/EC2'
-STATISTICS = ['Average', 'Maximum']
 # Period for CloudWatch metrics (e.g., 1 day) - adjust granularity vs. cost/API calls
 CW_PERIOD_SECONDS = 86400 # 24 * 60 * 60
+# GetMetricData accepts at most 500 queries per request
+METRIC_DATA_MAX_QUERIES = 500
+
+# --- Constants for EC2 Inventory Scans ---
+# Maximum number of availability zones described concurrently
+AZ_FETCH_MAX_WORKERS = 5
+# Maximum number of regions scanned concurrently by the *_all_regions helpers (AWS_FETCH_WORKERS overrides)
+REGION_SCAN_MAX_WORKERS = int(os.getenv('AWS_FETCH_WORKERS', '16'))
+# Instance states included in inventory scans (everything except terminated)
+ACTIVE_INSTANCE_STATES = ['pending', 'running', 'shutting-down', 'stopped', 'stopping']
+# How long one describe_instances / describe_volumes scan is shared between checks
+INSTANCE_LIST_CACHE_TTL_SECONDS = 120
+VOLUME_LIST_CACHE_TTL_SECONDS = 120
+# JMESPath expressions that flatten describe_* pages into individual resources,
+# projected down to the fields the checks read so cached scans stay small
+INSTANCES_EXPRESSION = 'Reservations[].Instances[].{InstanceId: InstanceId, StateName: State.Name, Tags: Tags}'
+VOLUMES_EXPRESSION = 'Volumes[].{VolumeId: VolumeId, State: State, VolumeType: VolumeType, Size: Size, Tags: Tags}'
+# Largest page sizes EC2 accepts, to minimise round trips on big fleets:
+# DescribeInstances caps MaxResults at 1000, DescribeVolumes at 500
+INSTANCE_PAGE_SIZE = 1000
+VOLUME_PAGE_SIZE = 500
 
 # --- Constants for Untagged Resource Detection ---
 # Define the tags that are considered mandatory
-REQUIRED_TAGS = ['Project', 'Owner'] # Example tags, adjust as needed
+REQUIRED_TAGS = ('Project', 'Owner') # Example tags, adjust as needed
+_REQUIRED_TAGS_SET = frozenset(REQUIRED_TAGS)
+
+# --- Constants for the Cost Explorer Response Cache ---
+# How long stored Cost Explorer responses are reused when COST_CACHE_MODE=on
+COST_DISK_CACHE_TTL_SECONDS = 6 * 60 * 60
+# How long stored EC2/EBS inventory results are reused when COST_CACHE_MODE=on
+INVENTORY_DISK_CACHE_TTL_SECONDS = 10 * 60
 
 # --- Constants for S3 Analysis ---
 # Storage classes that can be optimized
@@ -31,6 +62,75 @@ OPTIMIZABLE_STORAGE_CLASSES = ['STANDARD', 'REDUCED_REDUNDANCY']
 # Target storage classes for optimization
 RECOMMENDED_STORAGE_CLASSES = ['STANDARD_IA', 'GLACIER', 'DEEP_ARCHIVE']
 
+def _without_metadata(response):
+    """Helper function to drop boto3's ResponseMetadata so only the API payload is cached."""
+    return {key: value for key, value in response.items() if key != 'ResponseMetadata'}
+
+def _iter_cost_results(ce_client, **request):
+    """
+    Calls get_cost_and_usage and yields every ResultsByTime entry, following NextPageToken.
+    Each page goes through the opt-in response cache (see cache.py), keyed on the request.
+
+    Args:
+        ce_client: The Cost Explorer client.
+        **request: Parameters passed through to get_cost_and_usage.
+    """
+    while True:
+        response = cached_call(
+            'ce:GetCostAndUsage', request, COST_DISK_CACHE_TTL_SECONDS,
+            lambda: _without_metadata(ce_client.get_cost_and_usage(**request))
+        )
+        yield from response.get('ResultsByTime', [])
+        next_token = response.get('NextPageToken')
+        if not next_token:
+            break
+        request['NextPageToken'] = next_token
+
+def _utc_today():
+    """Helper function returning the current date in UTC, the day boundary AWS bills and aggregates on."""
+    return datetime.now(timezone.utc).date()
+
+@functools.lru_cache(maxsize=8)
+def _cost_period(end_day, days):
+    """
+    Builds the Cost Explorer TimePeriod strings for the `days` days ending on end_day.
+
+    Keyed on the day, so every call within one UTC day sends an identical request.
+
+    Args:
+        end_day (date): The (exclusive) end date.
+        days (int): The number of days to cover.
+
+    Returns:
+        tuple: (start_str, end_str) formatted as YYYY-MM-DD.
+    """
+    start_day = end_day - timedelta(days=days)
+    # date.isoformat() is already YYYY-MM-DD and skips strftime's format parsing
+    return start_day.isoformat(), end_day.isoformat()
+
+@functools.lru_cache(maxsize=4)
+def _idle_window(end_day):
+    """
+    Returns the CloudWatch window used for idle detection, ending at midnight UTC of end_day.
+
+    With daily metric periods, aligning the window on midnight keeps every
+    request within a day identical and covers IDLE_CHECK_PERIOD_DAYS whole days.
+
+    Args:
+        end_day (date): The day whose midnight (UTC) ends the window.
+
+    Returns:
+        tuple: (start_time, end_time) as timezone-aware datetimes.
+    """
+    end_time = datetime.combine(end_day, datetime.min.time(), tzinfo=timezone.utc)
+    return end_time - timedelta(days=IDLE_CHECK_PERIOD_DAYS), end_time
+
+def _service_costs(results_by_time):
+    """Helper function to flatten Cost Explorer ResultsByTime into (service, cost) pairs."""
+    for result in results_by_time:
+        for group in result.get('Groups', []):
+            yield group['Keys'][0], float(group['Metrics']['UnblendedCost']['Amount'])
+
 def get_cost_by_service(days=30):
     """
     Fetches cost data grouped by service from AWS Cost Explorer.
@@ -39,25 +139,21 @@ def get_cost_by_service(days=30):
         days (int): The number of past days to fetch data for.
 
     Returns:
-        dict: A dictionary with service names as keys and costs as values,
+        dict: A dictionary with service names as keys and unrounded costs (USD) as values,
               or None if an error occurs.
     """
     ce_client = get_client('ce')
     if not ce_client:
-        logging.error("Cost Explorer client is not available.")
+        logger.error("Cost Explorer client is not available.")
         return None
 
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-
-    # Format dates as YYYY-MM-DD strings
-    start_str = start_date.strftime('%Y-%m-%d')
-    end_str = end_date.strftime('%Y-%m-%d')
+    start_str, end_str = _cost_period(_utc_today(), days)
 
-    logging.info(f"Fetching cost data from {start_str} to {end_str}")
+    logger.info("Fetching cost data from %s to %s", start_str, end_str)
 
     try:
-        response = ce_client.get_cost_and_usage(
+        results = _iter_cost_results(
+            ce_client,
             TimePeriod={
                 'Start': start_str,
                 'End': end_str
@@ -72,28 +168,188 @@ def get_cost_by_service(days=30):
             ]
         )
 
-        costs_by_service = {}
-        for result in response.get('ResultsByTime', []):
-            for group in result.get('Groups', []):
-                service_name = group['Keys'][0]
-                cost = float(group['Metrics']['UnblendedCost']['Amount'])
-                if cost > 0: # Only include services with non-zero cost
-                    costs_by_service[service_name] = costs_by_service.get(service_name, 0) + cost
+        costs_by_service = defaultdict(float)
+        for service_name, cost in _service_costs(results):
+            if cost > 0: # Only include services with non-zero cost
+                costs_by_service[service_name] += cost
 
-        # Round costs for readability
-        costs_by_service = {k: round(v, 2) for k, v in costs_by_service.items()}
-        logging.info(f"Successfully fetched costs for {len(costs_by_service)} services.")
-        return costs_by_service
+        # Costs keep full precision so sums across periods stay exact; round at display time
+        logger.info("Successfully fetched costs for %d services.", len(costs_by_service))
+        return dict(costs_by_service)
 
     except Exception as e:
-        logging.error(f"Error fetching cost data from Cost Explorer: {e}")
+        logger.error("Error fetching cost data from Cost Explorer: %s", e)
         return None
 
 
+def _describe_by_az(ec2_client, operation, expression, filters=None, page_size=None):
+    """
+    Runs a paginated EC2 describe call once per availability zone, concurrently.
+
+    Each AZ gets its own paginator (filtered on 'availability-zone') and the
+    paginators run in a thread pool, so wall time is bounded by the largest AZ
+    instead of the whole region. Falls back to a single region-wide paginator
+    if the AZs cannot be listed or there is only one.
+
+    Args:
+        ec2_client: The EC2 client for the region.
+        operation (str): The paginated operation, e.g. 'describe_instances'.
+        expression (str): JMESPath expression selecting the items from each page,
+                          e.g. INSTANCES_EXPRESSION.
+        filters (list, optional): Extra EC2 filters applied to every call.
+        page_size (int, optional): Items requested per page (MaxResults).
+
+    Returns:
+        list: All items returned across the zones. API errors are raised to the caller.
+    """
+    filters = list(filters or [])
+
+    def fetch(zone_filters):
+        pagination_config = {'PageSize': page_size} if page_size else {}
+        pages = ec2_client.get_paginator(operation).paginate(
+            Filters=filters + zone_filters, PaginationConfig=pagination_config
+        )
+        # search() streams matching items page by page instead of holding whole pages
+        return [item for item in pages.search(expression) if item is not None]
+
+    try:
+        zones = [zone['ZoneName'] for zone in ec2_client.describe_availability_zones()['AvailabilityZones']]
+    except Exception as e:
+        logger.debug("Could not list availability zones, scanning the region in one pass: %s", e)
+        zones = []
+
+    if len(zones) <= 1:
+        return fetch([])
+
+    with ThreadPoolExecutor(max_workers=min(AZ_FETCH_MAX_WORKERS, len(zones))) as executor:
+        results = executor.map(lambda zone: fetch([{'Name': 'availability-zone', 'Values': [zone]}]), zones)
+        return [item for zone_items in results for item in zone_items]
+
+@ttl_cache(INSTANCE_LIST_CACHE_TTL_SECONDS)
+def _list_instances(region):
+    """
+    Lists all non-terminated EC2 instances in a region.
+
+    The result is cached briefly so the idle-instance and untagged-resource
+    checks of one dashboard refresh share a single describe_instances scan.
+    Callers must treat the returned dicts as read-only.
+
+    Args:
+        region (str): The AWS region to list instances in.
+
+    Returns:
+        list: Instance dicts with 'InstanceId', 'StateName' and 'Tags' (None when
+              untagged), projected by INSTANCES_EXPRESSION. API errors are raised.
+    """
+    ec2_client = get_client('ec2', region_name=region)
+    if not ec2_client:
+        raise RuntimeError(f"EC2 client not available for region {region}.")
+    return _describe_by_az(
+        ec2_client, 'describe_instances', INSTANCES_EXPRESSION,
+        filters=[{'Name': 'instance-state-name', 'Values': ACTIVE_INSTANCE_STATES}],
+        page_size=INSTANCE_PAGE_SIZE
+    )
+
+@ttl_cache(VOLUME_LIST_CACHE_TTL_SECONDS)
+def _list_volumes(region):
+    """
+    Lists all EBS volumes in a region.
+
+    The result is cached briefly so the untagged-resource and EBS optimization
+    checks of one dashboard refresh share a single describe_volumes scan.
+    Callers must treat the returned dicts as read-only.
+
+    Args:
+        region (str): The AWS region to list volumes in.
+
+    Returns:
+        list: Volume dicts with 'VolumeId', 'State', 'VolumeType', 'Size' and 'Tags'
+              (None when untagged), projected by VOLUMES_EXPRESSION. API errors are raised.
+    """
+    ec2_client = get_client('ec2', region_name=region)
+    if not ec2_client:
+        raise RuntimeError(f"EC2 client not available for region {region}.")
+    return _describe_by_az(ec2_client, 'describe_volumes', VOLUMES_EXPRESSION, page_size=VOLUME_PAGE_SIZE)
+
+def clear_inventory_cache():
+    """Drops the cached instance and volume scans so the next check describes EC2 again."""
+    _list_instances.cache_clear()
+    _list_volumes.cache_clear()
+
+def _fetch_cpu_values(cw_client, instance_ids, start_time, end_time, stat):
+    """
+    Fetches one CPU statistic for many instances using batched GetMetricData calls.
+
+    Each request carries one query per instance, so it covers up to
+    METRIC_DATA_MAX_QUERIES instances instead of one GetMetricStatistics call
+    per instance.
+
+    Args:
+        cw_client: The CloudWatch client for the instances' region.
+        instance_ids (list): The instance IDs to fetch metrics for.
+        start_time (datetime): Start of the metric window.
+        end_time (datetime): End of the metric window.
+        stat (str): The CloudWatch statistic, e.g. 'Average' or 'Maximum'.
+
+    Returns:
+        dict: Maps each instance ID to its list of values.
+              Instances whose batch failed are left out.
+    """
+    values_by_instance = {}
+
+    for offset in range(0, len(instance_ids), METRIC_DATA_MAX_QUERIES):
+        batch = instance_ids[offset:offset + METRIC_DATA_MAX_QUERIES]
+        queries = [
+            {
+                'Id': f"{stat.lower()}_{index}",
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': NAMESPACE,
+                        'MetricName': METRIC_NAME,
+                        'Dimensions': [{'Name': 'InstanceId', 'Value': instance_id}]
+                    },
+                    'Period': CW_PERIOD_SECONDS,
+                    'Stat': stat,
+                    'Unit': 'Percent'
+                },
+                'ReturnData': True
+            }
+            for index, instance_id in enumerate(batch)
+        ]
+        query_targets = {query['Id']: instance_id for query, instance_id in zip(queries, batch)}
+
+        batch_values = {instance_id: [] for instance_id in batch}
+        try:
+            request = {
+                'MetricDataQueries': queries,
+                'StartTime': start_time,
+                'EndTime': end_time,
+                'ScanBy': 'TimestampDescending'
+            }
+            while True:
+                response = cw_client.get_metric_data(**request)
+                for result in response.get('MetricDataResults', []):
+                    batch_values[query_targets[result['Id']]].extend(result.get('Values', []))
+                next_token = response.get('NextToken')
+                if not next_token:
+                    break
+                request['NextToken'] = next_token
+        except Exception as cw_error:
+            logger.error("Error fetching CloudWatch %s metrics for %d instances: %s", stat, len(batch), cw_error)
+            continue # Move on to the next batch
+
+        values_by_instance.update(batch_values)
+
+    return values_by_instance
+
+
 def get_idle_ec2_instances(region=AWS_REGION):
     """
     Identifies potentially idle EC2 instances based on CloudWatch CPU metrics.
 
+    Average CPU is fetched for every running instance; Maximum CPU is only
+    fetched for the instances whose average is already below the threshold.
+
     Args:
         region (str): The AWS region to check instances in.
 
@@ -105,80 +361,144 @@ def get_idle_ec2_instances(region=AWS_REGION):
     cw_client = get_client('cloudwatch', region_name=region)
 
     if not ec2_client or not cw_client:
-        logging.error(f"EC2 or CloudWatch client not available for region {region}.")
+        logger.error("EC2 or CloudWatch client not available for region %s.", region)
         return None
 
     idle_instances = []
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=IDLE_CHECK_PERIOD_DAYS)
+    start_time, end_time = _idle_window(_utc_today())
 
-    logging.info(f"Checking for idle EC2 instances in region {region}...")
+    logger.info("Checking for idle EC2 instances in region %s...", region)
 
     try:
-        # Paginate through instances if necessary
-        paginator = ec2_client.get_paginator('describe_instances')
-        instance_pages = paginator.paginate(
-            Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]
-        )
-
-        for page in instance_pages:
-            for reservation in page.get('Reservations', []):
-                for instance in reservation.get('Instances', []):
-                    instance_id = instance['InstanceId']
-                    logging.debug(f"Checking instance: {instance_id}")
-
-                    try:
-                        # Get CloudWatch metrics
-                        metric_data = cw_client.get_metric_statistics(
-                            Namespace=NAMESPACE,
-                            MetricName=METRIC_NAME,
-                            Dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                            StartTime=start_time,
-                            EndTime=end_time,
-                            Period=CW_PERIOD_SECONDS,
-                            Statistics=STATISTICS,
-                            Unit='Percent'
-                        )
-
-                        datapoints = metric_data.get('Datapoints', [])
-                        if not datapoints:
-                            logging.warning(f"No {METRIC_NAME} data found for instance {instance_id} in the period.")
-                            continue # Skip if no data
-
-                        # Use pandas for easier calculation
-                        df = pd.DataFrame(datapoints)
-                        avg_cpu = df['Average'].mean()
-                        max_cpu = df['Maximum'].max()
-
-                        logging.debug(f"Instance {instance_id}: Avg CPU = {avg_cpu:.2f}%, Max CPU = {max_cpu:.2f}%")
-
-                        # Check idle criteria
-                        if avg_cpu < IDLE_AVG_CPU_THRESHOLD and max_cpu < IDLE_MAX_CPU_THRESHOLD:
-                            idle_info = {
-                                "InstanceId": instance_id,
-                                "Region": region,
-                                "AvgCPU": avg_cpu,
-                                "MaxCPU": max_cpu, # Include max for context
-                                "Reason": f"Avg CPU ({avg_cpu:.2f}%) < {IDLE_AVG_CPU_THRESHOLD}% and Max CPU ({max_cpu:.2f}%) < {IDLE_MAX_CPU_THRESHOLD}% over last {IDLE_CHECK_PERIOD_DAYS} days"
-                            }
-                            idle_instances.append(idle_info)
-                            logging.info(f"Identified potentially idle instance: {instance_id}")
-
-                    except Exception as cw_error:
-                        logging.error(f"Error fetching CloudWatch metrics for instance {instance_id}: {cw_error}")
-                        # Continue to the next instance
-
-        logging.info(f"Found {len(idle_instances)} potentially idle instances in region {region}.")
-        return idle_instances
-
+        instance_ids = [
+            instance['InstanceId']
+            for instance in _list_instances(region)
+            if instance['StateName'] == 'running'
+        ]
     except Exception as e:
-        logging.error(f"Error describing EC2 instances in region {region}: {e}")
+        logger.error("Error describing EC2 instances in region %s: %s", region, e)
         return None
 
-from .utils import _check_missing_tags
+    # First pass: average CPU for everything; most busy instances are ruled out here
+    average_values = _fetch_cpu_values(cw_client, instance_ids, start_time, end_time, 'Average')
+    avg_by_instance = {}
+    for instance_id in instance_ids:
+        averages = average_values.get(instance_id)
+        if averages is None:
+            continue # Metrics fetch failed for this batch; already logged
+        if not averages:
+            logger.warning("No %s data found for instance %s in the period.", METRIC_NAME, instance_id)
+            continue # Skip if no data
+        avg_cpu = sum(averages) / len(averages)
+        if avg_cpu < IDLE_AVG_CPU_THRESHOLD:
+            avg_by_instance[instance_id] = avg_cpu
+
+    # Second pass: maximum CPU only for the low-average candidates
+    candidate_ids = list(avg_by_instance)
+    maximum_values = _fetch_cpu_values(cw_client, candidate_ids, start_time, end_time, 'Maximum')
+
+    for instance_id in candidate_ids:
+        maximums = maximum_values.get(instance_id)
+        if not maximums:
+            continue # Failed batch (logged) or no datapoints
+        avg_cpu = avg_by_instance[instance_id]
+        max_cpu = max(maximums)
+
+        logger.debug("Instance %s: Avg CPU = %.2f%%, Max CPU = %.2f%%", instance_id, avg_cpu, max_cpu)
+
+        # Check idle criteria (the average was already checked in the first pass)
+        if max_cpu < IDLE_MAX_CPU_THRESHOLD:
+            idle_info = {
+                "InstanceId": instance_id,
+                "Region": region,
+                "AvgCPU": avg_cpu,
+                "MaxCPU": max_cpu, # Include max for context
+                "Reason": f"Avg CPU ({avg_cpu:.2f}%) < {IDLE_AVG_CPU_THRESHOLD}% and Max CPU ({max_cpu:.2f}%) < {IDLE_MAX_CPU_THRESHOLD}% over last {IDLE_CHECK_PERIOD_DAYS} days"
+            }
+            idle_instances.append(idle_info)
+            logger.info("Identified potentially idle instance: %s", instance_id)
+
+    logger.info("Found %d potentially idle instances in region %s.", len(idle_instances), region)
+    return idle_instances
+
+def _map_regions(fetch, regions):
+    """
+    Runs a per-region fetcher for many regions concurrently.
+
+    get_client caches one thread-safe client per (service, region), so the
+    worker threads share clients and their connection pools.
+
+    Args:
+        fetch (callable): Takes a region name and returns its result (None on failure).
+        regions (iterable): The regions to scan.
 
-# Remove the old function definition below
+    Returns:
+        dict: Maps each region to its result. Exceptions are logged and stored as None.
+    """
+    regions = list(regions)
+    if not regions:
+        return {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(REGION_SCAN_MAX_WORKERS, len(regions))) as executor:
+        futures = {executor.submit(fetch, region): region for region in regions}
+        for future, region in futures.items():
+            try:
+                results[region] = future.result()
+            except Exception as e:
+                logger.error("Error scanning region %s: %s", region, e)
+                results[region] = None
+    return results
 
+def get_idle_ec2_instances_all_regions(regions=None):
+    """
+    Identifies potentially idle EC2 instances across many regions in parallel.
+
+    Args:
+        regions (iterable, optional): The regions to check. Defaults to AWS_REGIONS.
+
+    Returns:
+        list: The idle instances of every region that was scanned successfully
+              (each entry carries its 'Region'). Failed regions are logged and skipped.
+    """
+    idle_instances = []
+    for region, region_idle in _map_regions(get_idle_ec2_instances, regions or AWS_REGIONS).items():
+        if region_idle is None:
+            logger.warning("Skipping region %s: idle instance scan failed.", region)
+            continue
+        idle_instances.extend(region_idle)
+    return idle_instances
+
+from .utils import _missing_tags_checker
+
+def _collect_untagged(resources, id_key, resource_type, region, required_tags_set):
+    """
+    Builds the untagged-resource entries for a batch of described resources.
+
+    Args:
+        resources (iterable): Instance or volume dicts from a describe call.
+        id_key (str): The key holding the resource ID ('InstanceId' or 'VolumeId').
+        resource_type (str): Label stored in each entry, e.g. 'EC2 Instance'.
+        region (str): Region stored in each entry.
+        required_tags_set (frozenset): The tag keys every resource must have.
+
+    Returns:
+        list: One dict per resource that is missing at least one required tag.
+    """
+    untagged = []
+    check_tags = _missing_tags_checker(required_tags_set) # Specialized once per batch
+    for resource in resources:
+        missing_tags = check_tags(resource.get('Tags'))
+        if missing_tags:
+            untagged.append({
+                'ResourceId': resource[id_key],
+                'ResourceType': resource_type,
+                'Region': region,
+                'MissingTags': missing_tags
+            })
+    logger.debug("Found %d untagged resources of type %s.", len(untagged), resource_type)
+    return untagged
+
+@cached(INVENTORY_DISK_CACHE_TTL_SECONDS)
 def get_untagged_resources(required_tags=None, region=None): # Corrected signature from previous attempt
     """
     Finds EC2 instances and EBS volumes missing specified required tags.
@@ -191,80 +511,70 @@ def get_untagged_resources(required_tags=None, region=None): # Corrected signatu
     Returns:
         dict: A dictionary containing lists of untagged 'Instances' and 'Volumes',
               or None if an error occurs. Each item includes the resource ID and missing tags.
+              If only the volume scan fails, the instance results are returned as a
+              PartialResult, which the caches do not store.
     """
     ec2_client = get_client('ec2', region_name=region or AWS_REGION)
     if not ec2_client:
-        logging.error(f"EC2 client not available for region {region}.")
+        logger.error("EC2 client not available for region %s.", region)
         return None
 
     if required_tags is None:
         required_tags = REQUIRED_TAGS
-    required_tags_set = set(required_tags)
+        required_tags_set = _REQUIRED_TAGS_SET
+    else:
+        required_tags_set = frozenset(required_tags)
     if not required_tags_set:
-        logging.warning("No required tags specified for untagged resource check.")
+        logger.warning("No required tags specified for untagged resource check.")
         return {'Instances': [], 'Volumes': []}
 
     untagged_resources = {'Instances': [], 'Volumes': []}
-    logging.info(f"Checking for resources missing tags {required_tags} in region {region or AWS_REGION}...")
+    logger.info("Checking for resources missing tags %s in region %s...", required_tags, region or AWS_REGION)
+
+    # Resources are listed through EC2 rather than the Resource Groups Tagging API:
+    # GetResources omits resources that have never been tagged, which are exactly
+    # the ones this check must report.
+
+    # The instance and volume scans are independent, so run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Include non-running instances and every volume (attached or not), as they might still need tags
+        instances_future = executor.submit(_list_instances, region or AWS_REGION)
+        volumes_future = executor.submit(_list_volumes, region or AWS_REGION)
 
     # --- Check EC2 Instances ---
     try:
-        logging.debug("Checking EC2 instances for missing tags...")
-        paginator_inst = ec2_client.get_paginator('describe_instances')
-        # Include non-running instances as well, as they might still need tags
-        instance_pages = paginator_inst.paginate(
-             Filters=[{'Name': 'instance-state-name', 'Values': ['pending', 'running', 'shutting-down', 'stopped', 'stopping']}]
-        )
+        logger.debug("Checking EC2 instances for missing tags...")
+        instances = instances_future.result()
 
-        for page in instance_pages:
-            for reservation in page.get('Reservations', []):
-                for instance in reservation.get('Instances', []):
-                    instance_id = instance['InstanceId']
-                    tags = instance.get('Tags', [])
-                    missing_tags = _check_missing_tags(tags, required_tags_set)
-                    if missing_tags:
-                        untagged_resources['Instances'].append({
-                            'ResourceId': instance_id,
-                            'ResourceType': 'EC2 Instance',
-                            'Region': region,
-                            'MissingTags': missing_tags
-                        })
-                        logging.debug(f"Instance {instance_id} missing tags: {missing_tags}")
+        untagged_resources['Instances'] = _collect_untagged(
+            instances, 'InstanceId', 'EC2 Instance', region, required_tags_set
+        )
 
     except Exception as e:
-        logging.error(f"Error describing EC2 instances for tag check in region {region or AWS_REGION}: {e}")
+        logger.error("Error describing EC2 instances for tag check in region %s: %s", region or AWS_REGION, e)
         # Continue to check volumes if possible, but maybe return partial results or None?
         # For now, let's return None if instance check fails significantly
         return None
 
     # --- Check EBS Volumes ---
     try:
-        logging.debug("Checking EBS volumes for missing tags...")
-        paginator_vol = ec2_client.get_paginator('describe_volumes')
-        # Check all volumes, regardless of state (attached/unattached)
-        volume_pages = paginator_vol.paginate()
-
-        for page in volume_pages:
-            for volume in page.get('Volumes', []):
-                volume_id = volume['VolumeId']
-                tags = volume.get('Tags', [])
-                missing_tags = _check_missing_tags(tags, required_tags_set)
-                if missing_tags:
-                    untagged_resources['Volumes'].append({
-                        'ResourceId': volume_id,
-                        'ResourceType': 'EBS Volume',
-                        'Region': region,
-                        'MissingTags': missing_tags
-                    })
-                    logging.debug(f"Volume {volume_id} missing tags: {missing_tags}")
+        logger.debug("Checking EBS volumes for missing tags...")
+        volumes = volumes_future.result()
+
+        untagged_resources['Volumes'] = _collect_untagged(
+            volumes, 'VolumeId', 'EBS Volume', region, required_tags_set
+        )
 
     except Exception as e:
-        logging.error(f"Error describing EBS volumes for tag check in region {region or AWS_REGION}: {e}")
+        logger.error("Error describing EBS volumes for tag check in region %s: %s", region or AWS_REGION, e)
         # Allow returning partial results if instances were checked successfully
         # but volumes failed. The caller can decide how to handle this.
         # If instance check also failed, we would have returned None already.
+        # Marked partial so neither cache layer keeps the empty volume list.
+        untagged_resources = PartialResult(untagged_resources)
 
-    logging.info(f"Found {len(untagged_resources['Instances'])} untagged instances and {len(untagged_resources['Volumes'])} untagged volumes in region {region or AWS_REGION}.")
+    logger.info("Found %d untagged instances and %d untagged volumes in region %s.",
+                len(untagged_resources['Instances']), len(untagged_resources['Volumes']), region or AWS_REGION)
     return untagged_resources
 
 
@@ -281,21 +591,16 @@ def get_daily_cost_history(days=60):
     """
     ce_client = get_client('ce')
     if not ce_client:
-        logging.error("Cost Explorer client is not available.")
+        logger.error("Cost Explorer client is not available.")
         return None
 
-    # Go back `days + 1` to ensure we have enough data for comparison
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
+    start_str, end_str = _cost_period(_utc_today(), days)
 
-    # Format dates as YYYY-MM-DD strings
-    start_str = start_date.strftime('%Y-%m-%d')
-    end_str = end_date.strftime('%Y-%m-%d')
-
-    logging.info(f"Fetching daily cost history from {start_str} to {end_str}")
+    logger.info("Fetching daily cost history from %s to %s", start_str, end_str)
 
     try:
-        response = ce_client.get_cost_and_usage(
+        results = _iter_cost_results(
+            ce_client,
             TimePeriod={
                 'Start': start_str,
                 'End': end_str
@@ -306,19 +611,26 @@ def get_daily_cost_history(days=60):
         )
 
         daily_costs = {}
-        for result in response.get('ResultsByTime', []):
-            date_str = result['TimePeriod']['Start']
+        in_order = True
+        last_date = ''
+        for result in results:
+            date_str = result['TimePeriod']['Start'] # Already YYYY-MM-DD, used as-is
             cost = float(result['Total']['UnblendedCost']['Amount'])
             daily_costs[date_str] = round(cost, 2)
+            if date_str < last_date:
+                in_order = False
+            last_date = date_str
 
-        logging.info(f"Successfully fetched daily costs for {len(daily_costs)} days.")
-        # Sort by date, although Cost Explorer usually returns it sorted
-        return dict(sorted(daily_costs.items()))
+        logger.info("Successfully fetched daily costs for %d days.", len(daily_costs))
+        # Cost Explorer returns days in order, so the insertion-ordered dict is normally
+        # already sorted; only re-sort if a page came back out of order
+        return daily_costs if in_order else dict(sorted(daily_costs.items()))
 
     except Exception as e:
-        logging.error(f"Error fetching daily cost history from Cost Explorer: {e}")
+        logger.error("Error fetching daily cost history from Cost Explorer: %s", e)
         return None
 
+@cached(INVENTORY_DISK_CACHE_TTL_SECONDS)
 def get_ebs_optimization_candidates(region=None):
     """
     Finds EBS volumes that are optimization candidates:
@@ -335,53 +647,52 @@ def get_ebs_optimization_candidates(region=None):
     target_region = region or AWS_REGION
     ec2_client = get_client('ec2', region_name=target_region)
     if not ec2_client:
-        logging.error(f"EC2 client not available for region {target_region}.")
+        logger.error("EC2 client not available for region %s.", target_region)
         return None
 
     optimization_candidates = {'UnattachedVolumes': [], 'Gp2Volumes': []}
-    logging.info(f"Checking for EBS optimization candidates in region {target_region}...")
+    logger.info("Checking for EBS optimization candidates in region %s...", target_region)
 
     try:
-        paginator = ec2_client.get_paginator('describe_volumes')
-        volume_pages = paginator.paginate() # Get all volumes
-
-        for page in volume_pages:
-            for volume in page.get('Volumes', []):
-                volume_id = volume['VolumeId']
-                volume_state = volume['State']
-                volume_type = volume['VolumeType']
-                volume_size = volume['Size'] # Size in GiB
-
-                # Check if unattached
-                if volume_state == 'available':
-                    optimization_candidates['UnattachedVolumes'].append({
-                        'ResourceId': volume_id,
-                        'ResourceType': 'EBS Volume',
-                        'Region': target_region,
-                        'SizeGiB': volume_size,
-                        'Reason': 'Unattached (Available)'
-                    })
-                    logging.debug(f"Volume {volume_id} is unattached.")
-
-                # Check if gp2 (potential gp3 candidate)
-                # Note: Further analysis needed to confirm gp3 is cheaper/better.
-                # This just flags them.
-                if volume_type == 'gp2':
-                    optimization_candidates['Gp2Volumes'].append({
-                        'ResourceId': volume_id,
-                        'ResourceType': 'EBS Volume',
-                        'Region': target_region,
-                        'SizeGiB': volume_size,
-                        'CurrentType': 'gp2',
-                        'Reason': 'Potential gp3 Upgrade Candidate'
-                    })
-                    logging.debug(f"Volume {volume_id} is gp2 type.")
+        volumes = _list_volumes(target_region) # Get all volumes
+
+        for volume in volumes:
+            volume_id = volume['VolumeId']
+            volume_state = volume['State']
+            volume_type = volume['VolumeType']
+            volume_size = volume['Size'] # Size in GiB
+
+            # Check if unattached
+            if volume_state == 'available':
+                optimization_candidates['UnattachedVolumes'].append({
+                    'ResourceId': volume_id,
+                    'ResourceType': 'EBS Volume',
+                    'Region': target_region,
+                    'SizeGiB': volume_size,
+                    'Reason': 'Unattached (Available)'
+                })
+                logger.debug("Volume %s is unattached.", volume_id)
+
+            # Check if gp2 (potential gp3 candidate)
+            # Note: Further analysis needed to confirm gp3 is cheaper/better.
+            # This just flags them.
+            if volume_type == 'gp2':
+                optimization_candidates['Gp2Volumes'].append({
+                    'ResourceId': volume_id,
+                    'ResourceType': 'EBS Volume',
+                    'Region': target_region,
+                    'SizeGiB': volume_size,
+                    'CurrentType': 'gp2',
+                    'Reason': 'Potential gp3 Upgrade Candidate'
+                })
+                logger.debug("Volume %s is gp2 type.", volume_id)
 
     except Exception as e:
-        logging.error(f"Error describing EBS volumes for optimization check in region {target_region}: {e}")
+        logger.error("Error describing EBS volumes for optimization check in region %s: %s", target_region, e)
         return None # Return None on error
 
-    logging.info(f"Found {len(optimization_candidates['UnattachedVolumes'])} unattached volumes and {len(optimization_candidates['Gp2Volumes'])} gp2 volumes.")
+    logger.info("Found %d unattached volumes and %d gp2 volumes.",
+                len(optimization_candidates['UnattachedVolumes']), len(optimization_candidates['Gp2Volumes']))
     return optimization_candidates
 
 def get_s3_bucket_analysis(region=None):
@@ -396,8 +707,9 @@ def get_s3_bucket_analysis(region=None):
     """
     s3_client = get_client('s3', region)
     if not s3_client:
-        logging.error("S3 client is not available.")
+        logger.error("S3 client is not available.")
         return None
+    cw_client = get_client('cloudwatch') # Looked up once for every bucket's size metrics
         
     try:
         # Get list of all buckets
@@ -411,7 +723,7 @@ def get_s3_bucket_analysis(region=None):
         
         for bucket in buckets:
             bucket_name = bucket['Name']
-            logging.info(f"Analyzing bucket: {bucket_name}")
+            logger.info("Analyzing bucket: %s", bucket_name)
             
             try:
                 # Get bucket location
@@ -419,7 +731,7 @@ def get_s3_bucket_analysis(region=None):
                 bucket_region = bucket_location.get('LocationConstraint') or 'us-east-1'
                 
                 # Get bucket size and object count
-                bucket_info = _get_bucket_size_and_count(s3_client, bucket_name)
+                bucket_info = _get_bucket_size_and_count(s3_client, cw_client, bucket_name)
                 
                 # Get storage class distribution
                 storage_class_dist = _get_bucket_storage_classes(s3_client, bucket_name)
@@ -450,7 +762,7 @@ def get_s3_bucket_analysis(region=None):
                     optimization_opportunities.extend(bucket_optimization['opportunities'])
                     
             except Exception as e:
-                logging.warning(f"Could not analyze bucket {bucket_name}: {str(e)}")
+                logger.warning("Could not analyze bucket %s: %s", bucket_name, e)
                 continue
                 
         return {
@@ -466,20 +778,18 @@ def get_s3_bucket_analysis(region=None):
         }
         
     except Exception as e:
-        logging.error(f"Error fetching S3 bucket analysis: {str(e)}")
+        logger.error("Error fetching S3 bucket analysis: %s", e)
         return None
 
-def _get_bucket_size_and_count(s3_client, bucket_name):
+def _get_bucket_size_and_count(s3_client, cw_client, bucket_name):
     """
     Helper function to get bucket size and object count using CloudWatch metrics.
-    Falls back to listing objects if metrics are not available.
+    Falls back to listing objects if metrics are not available (or cw_client is None).
     """
-    cw_client = get_client('cloudwatch')
-    
     try:
         if cw_client:
             # Try to get size from CloudWatch metrics
-            end_time = datetime.now()
+            end_time = datetime.now(timezone.utc)
             start_time = end_time - timedelta(days=2)
             
             # Get bucket size in bytes
@@ -522,7 +832,7 @@ def _get_bucket_size_and_count(s3_client, bucket_name):
                     'object_count': int(latest_count['Average'])
                 }
     except Exception as e:
-        logging.warning(f"Could not get CloudWatch metrics for {bucket_name}: {str(e)}")
+        logger.warning("Could not get CloudWatch metrics for %s: %s", bucket_name, e)
     
     # Fallback: estimate by listing objects (limited to first 1000 for performance)
     try:
@@ -541,7 +851,7 @@ def _get_bucket_size_and_count(s3_client, bucket_name):
             'object_count': object_count
         }
     except Exception as e:
-        logging.warning(f"Could not list objects for {bucket_name}: {str(e)}")
+        logger.warning("Could not list objects for %s: %s", bucket_name, e)
         return {'size_gb': 0, 'object_count': 0}
 
 def _get_bucket_storage_classes(s3_client, bucket_name):
@@ -561,7 +871,7 @@ def _get_bucket_storage_classes(s3_client, bucket_name):
             
         return storage_classes
     except Exception as e:
-        logging.warning(f"Could not get storage classes for {bucket_name}: {str(e)}")
+        logger.warning("Could not get storage classes for %s: %s", bucket_name, e)
         return {}
 
 def _check_bucket_lifecycle(s3_client, bucket_name):
@@ -574,7 +884,7 @@ def _check_bucket_lifecycle(s3_client, bucket_name):
     except s3_client.exceptions.NoSuchLifecycleConfiguration:
         return False
     except Exception as e:
-        logging.warning(f"Could not check lifecycle policy for {bucket_name}: {str(e)}")
+        logger.warning("Could not check lifecycle policy for %s: %s", bucket_name, e)
         return False
 
 def _analyze_bucket_optimization(bucket_name, bucket_info, storage_classes, has_lifecycle):
@@ -620,12 +930,41 @@ def _analyze_bucket_optimization(bucket_name, bucket_info, storage_classes, has_
         'potential_monthly_savings_usd': round(potential_savings, 2)
     }
 
+def fetch_all(days=30, region=None):
+    """
+    Fetches cost by service, idle instances and untagged resources concurrently.
+
+    The three fetchers are independent and spend their time waiting on AWS,
+    so running them in threads makes the total roughly the slowest of the three.
+
+    Args:
+        days (int): The number of past days of cost data to fetch.
+        region (str, optional): The AWS region for the EC2 checks. Defaults to AWS_REGION.
+
+    Returns:
+        dict: {'costs': ..., 'idle': ..., 'untagged': ...} holding each fetcher's
+              result (None for a fetch that failed).
+    """
+    target_region = region or AWS_REGION
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        costs = executor.submit(get_cost_by_service, days)
+        idle = executor.submit(get_idle_ec2_instances, target_region)
+        untagged = executor.submit(get_untagged_resources, None, target_region)
+        return {
+            'costs': costs.result(),
+            'idle': idle.result(),
+            'untagged': untagged.result(),
+        }
+
 # Example usage (optional, for testing this module directly)
 if __name__ == '__main__':
-    logging.info("--- Testing Data Fetcher ---")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info("--- Testing Data Fetcher ---")
+
+    print("\nFetching Cost Data, Idle Instances and Untagged Resources in parallel...")
+    results = fetch_all(days=7)
 
-    print("\nFetching Cost Data...")
-    costs = get_cost_by_service(days=7)
+    costs = results['costs']
     if costs:
         print("Costs by Service (Last 7 Days):")
         for service, cost in costs.items():
@@ -633,8 +972,7 @@ if __name__ == '__main__':
     else:
         print("Could not fetch cost data.")
 
-    print("\nFetching Idle Instances...")
-    idle = get_idle_ec2_instances()
+    idle = results['idle']
     if idle is not None:
         print(f"Found {len(idle)} potentially idle instances in {AWS_REGION}:")
         for inst in idle:
@@ -642,10 +980,9 @@ if __name__ == '__main__':
     else:
         print("Could not fetch idle instance data.")
 
-    print("\nFetching Untagged Resources...")
-    untagged = get_untagged_resources(region='us-west-2')  # Example with a specific region
+    untagged = results['untagged']
     if untagged is not None:
-        print(f"Found {len(untagged['Instances'])} untagged instances in us-west-2:")
+        print(f"Found {len(untagged['Instances'])} untagged instances in {AWS_REGION}:")
         for inst in untagged['Instances']:
             print(f"  ID: {inst['ResourceId']}, Missing: {inst['MissingTags']}")
         print(f"Found {len(untagged['Volumes'])} untagged volumes in {AWS_REGION}:")
@@ -676,4 +1013,4 @@ if __name__ == '__main__':
         print("Could not fetch daily cost history.")
 
 
-    logging.info("--- Data Fetcher Test Complete ---")
\ No newline at end of file
+    logger.info("--- Data Fetcher Test Complete ---")
\ No newline at end of file
@@ -1,12 +1,146 @@
 # utils.py
 # Utility functions
+import functools
+import operator
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+_tag_key = operator.itemgetter('Key')
+
+class PartialResult(dict):
+    """
+    A fetcher result that is incomplete because part of the fetch failed.
+
+    It behaves (and serializes) exactly like a dict, but the result caches never
+    store it, so a transient API error is retried on the next call instead of
+    being served as an empty section.
+    """
+
+@functools.lru_cache(maxsize=32)
+def _missing_tags_checker(required_tags):
+    """
+    Builds a tag checker specialized for one fixed set of required tag keys.
+
+    Each required key gets a bit, so checking a resource is one dict lookup and
+    one OR per tag instead of building a set; the scan stops as soon as every
+    required key has been seen. Checkers are cached per key set. This is the
+    entry point for batch checks: build the checker once, then call it per resource.
+
+    Args:
+        required_tags (frozenset): The tag keys every resource must have.
+
+    Returns:
+        callable: check(resource_tags_list) -> sorted list of the missing keys.
+    """
+    ordered = sorted(required_tags)
+    bits = {key: 1 << index for index, key in enumerate(ordered)}
+    all_present = (1 << len(ordered)) - 1
+    bit_for, tag_key = bits.get, _tag_key # Closure locals: no global or attribute lookups per tag
+
+    def check(resource_tags_list):
+        if not resource_tags_list: # 'Tags' may be missing entirely
+            return list(ordered)
+        seen = 0
+        for key in map(tag_key, resource_tags_list):
+            seen |= bit_for(key, 0)
+            if seen == all_present:
+                return [] # Every required tag found; skip the rest of the tags
+        return [key for index, key in enumerate(ordered) if not seen >> index & 1]
+
+    return check
 
 def _check_missing_tags(resource_tags_list, required_tags_set):
-    """Helper function to find missing tags from a list of tag dictionaries."""
-    if not resource_tags_list: # Handle case where 'Tags' key might be missing entirely
-        return list(required_tags_set) # All required tags are missing
-
-    # Convert [{'Key': k, 'Value': v}, ...] to a set of keys {'k', ...}
-    present_tags_set = {tag['Key'] for tag in resource_tags_list}
-    missing = list(required_tags_set - present_tags_set)
-    return missing
\ No newline at end of file
+    """
+    Helper function to find missing tags from a list of tag dictionaries (sorted, for stable output).
+    Convenience wrapper for one-off checks; loops should call _missing_tags_checker() once instead.
+    """
+    return _missing_tags_checker(frozenset(required_tags_set))(resource_tags_list)
+
+def _freeze(value):
+    """Helper function to turn (nested) lists, sets and dicts into hashable equivalents."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+def ttl_cache(seconds, maxsize=128, bucket=None):
+    """
+    Decorator that memoizes a function's return value for a number of seconds.
+
+    Results are keyed on the call arguments (lists such as required_tags are
+    converted to tuples so they can be hashed). None results signal a failed
+    fetch and PartialResult values a partly failed one; neither is cached, so
+    the next call retries. At most maxsize
+    entries are kept; the least recently used one is evicted first. The
+    wrapped function exposes a cache_clear() method.
+
+    Calls are single-flight: while one thread computes a key, other threads
+    asking for the same key wait for that result (or exception) instead of
+    starting their own call, so concurrent checks share one AWS scan.
+
+    Args:
+        seconds (float): How long a cached result stays valid.
+        maxsize (int): Maximum number of cached results.
+        bucket (callable, optional): Called on every lookup; its return value is part
+            of the key, so entries from an earlier bucket (e.g. yesterday's UTC date)
+            are never served even if seconds has not elapsed.
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        pending = {} # Key -> Future of the call currently computing it
+        generation = [0] # Bumped by cache_clear() so calls started before it are not stored
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (_freeze(args), _freeze(kwargs), bucket() if bucket else None)
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and now - entry[0] < seconds:
+                    cache.move_to_end(key)
+                    return entry[1]
+                future = pending.get(key)
+                if future is None:
+                    future = pending[key] = Future()
+                    started = generation[0]
+                else:
+                    started = None # Another thread is already computing this key
+
+            if started is None:
+                return future.result()
+
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                with lock:
+                    if pending.get(key) is future:
+                        del pending[key]
+                future.set_exception(e)
+                raise
+
+            with lock:
+                if pending.get(key) is future:
+                    del pending[key]
+                if result is not None and not isinstance(result, PartialResult) and generation[0] == started:
+                    cache[key] = (now, result)
+                    cache.move_to_end(key)
+                    while len(cache) > maxsize:
+                        cache.popitem(last=False)
+            future.set_result(result)
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                pending.clear() # Calls made after a clear start fresh instead of joining older ones
+                generation[0] += 1
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
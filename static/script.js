@@ -35,7 +35,9 @@ function renderCostChart(data) {
         type: 'pie',
         hole: .4, // Optional: makes it a donut chart
         textinfo: "label+percent",
-        insidetextorientation: "radial"
+        insidetextorientation: "radial",
+        // Costs arrive unrounded from the API; round to cents for display
+        hovertemplate: '%{label}: $%{value:.2f} (%{percent})<extra></extra>'
     }];
 
     const layout = {
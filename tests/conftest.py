@@ -0,0 +1,54 @@
+import os
+import pytest
+import boto3
+from moto import mock_aws
+
+# Must be set before test modules import src.app, which otherwise warms boto3 clients on import
+os.environ.setdefault("AWS_WARM_CLIENTS", "0")
+
+# Fake credentials so nothing can reach a real account, and the on-disk response cache switched off
+TEST_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SECURITY_TOKEN": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1", # Match default in connector
+    "AWS_OPT_CACHE_DISABLE": "1", # Never read or write the on-disk response cache
+}
+
+def pytest_configure(config):
+    """Registers the custom markers used by this suite."""
+    config.addinivalue_line("markers", "slow: builds resources in moto backends; skip with -m 'not slow'")
+
+@pytest.fixture(scope="session", autouse=True)
+def aws_test_env():
+    """Sets TEST_ENV for the whole session and restores the original environment afterwards."""
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in TEST_ENV.items():
+            mp.setenv(name, value)
+        yield
+
+@pytest.fixture(scope="session")
+def aws_mock():
+    """
+    Starts moto once for the whole test session and builds the boto3 clients tests use.
+
+    Building a client parses its service model, so sharing them across tests
+    avoids paying that cost (and a moto start/stop) in every test.
+    """
+    from src.aws_connector import AWS_REGION # Imported lazily, after aws_test_env has run
+    mock = mock_aws()
+    mock.start()
+    session = boto3.Session(region_name=AWS_REGION) # One loader, so service models are read once
+    yield mock, {
+        "ec2": session.client("ec2"),
+        "cw": session.client("cloudwatch"),
+    }
+    mock.stop()
+
+@pytest.fixture
+def aws(aws_mock):
+    """Gives a test the shared moto clients, with every moto backend reset to an empty account."""
+    mock, clients = aws_mock
+    mock.reset()
+    return clients
@@ -1,10 +1,17 @@
 import pytest
+from datetime import date
 from unittest.mock import patch
 from src.analyzer import (
     analyze_cost_data, analyze_idle_instances, analyze_untagged_resources,
-    analyze_ebs_optimization, analyze_cost_anomalies # Import new functions
+    analyze_ebs_optimization, analyze_cost_anomalies, # Import new functions
+    clear_caches
 )
 
+@pytest.fixture(autouse=True)
+def clear_analyzer_caches():
+    """Analyzer results are TTL-cached; start every test with empty caches."""
+    clear_caches()
+
 # Basic test structure - more tests to be added
 
 @patch('src.analyzer.get_cost_by_service') # Mock the data fetcher function
@@ -18,6 +25,41 @@ def test_analyze_cost_data_success(mock_get_cost):
     assert result == mock_cost_data
     mock_get_cost.assert_called_once_with(days=30)
 
+@patch('src.analyzer.get_cost_by_service')
+def test_analyze_cost_data_cached(mock_get_cost):
+    """Tests that repeated calls with the same arguments are served from the cache."""
+    mock_get_cost.return_value = {"EC2": 100.0}
+
+    assert analyze_cost_data(days=30) == {"EC2": 100.0}
+    assert analyze_cost_data(days=30) == {"EC2": 100.0}
+    mock_get_cost.assert_called_once_with(days=30)
+
+    analyze_cost_data(days=7) # Different arguments are a separate cache entry
+    assert mock_get_cost.call_count == 2
+
+    clear_caches() # Explicit refresh
+    analyze_cost_data(days=30)
+    assert mock_get_cost.call_count == 3
+
+@patch('src.analyzer.get_daily_cost_history')
+@patch('src.analyzer.get_cost_by_service')
+def test_cost_results_expire_at_utc_midnight(mock_get_cost, mock_get_history):
+    """Tests that cached cost results are keyed on the UTC day, so a new day refetches the new window."""
+    mock_get_cost.return_value = {"EC2": 100.0}
+    mock_get_history.return_value = {'2024-01-01': 10.0, '2024-01-02': 10.0, '2024-01-03': 10.0}
+
+    with patch('src.analyzer._utc_today', return_value=date(2024, 1, 3)):
+        analyze_cost_data(days=30)
+        analyze_cost_anomalies(history_days=3)
+        analyze_cost_data(days=30)
+        analyze_cost_anomalies(history_days=3)
+    assert mock_get_cost.call_count == 1 and mock_get_history.call_count == 1
+
+    with patch('src.analyzer._utc_today', return_value=date(2024, 1, 4)): # Past UTC midnight
+        analyze_cost_data(days=30)
+        analyze_cost_anomalies(history_days=3)
+    assert mock_get_cost.call_count == 2 and mock_get_history.call_count == 2
+
 @patch('src.analyzer.get_cost_by_service')
 def test_analyze_cost_data_failure(mock_get_cost):
     """Tests that analyze_cost_data returns None when fetcher fails."""
@@ -106,14 +148,15 @@ def test_analyze_cost_anomalies_detected(mock_get_history):
 
     assert result is not None
     assert result['is_anomaly'] == True
+    assert isinstance(result['is_anomaly'], bool) # Plain bool so the result stays JSON serializable
     assert result['latest_date'] == '2024-01-05'
     assert result['latest_cost'] == 50.0
-    # Avg/StdDev based on first 4 days: (10 + 11 + 9 + 10.5) / 4 = 10.125, rounded to 10.12
-    assert result['average_cost'] == 10.12
-    # StdDev: sqrt(((10-10.125)^2 + (11-10.125)^2 + (9-10.125)^2 + (10.5-10.125)^2) / 4) = 0.7395, rounded to 0.74
-    assert result['std_dev'] == pytest.approx(0.74)
-    # Threshold: 10.12 + 2.5 * 0.74 = 10.12 + 1.85 = 11.97
-    assert result['threshold'] == 11.97
+    # Avg/StdDev based on first 4 days: (10 + 11 + 9 + 10.5) / 4 = 10.125
+    assert result['average_cost'] == pytest.approx(10.125)
+    # StdDev: sqrt(((10-10.125)^2 + (11-10.125)^2 + (9-10.125)^2 + (10.5-10.125)^2) / 4) = 0.7395
+    assert result['std_dev'] == pytest.approx(0.7395, abs=1e-4)
+    # Threshold: 10.125 + 2.5 * 0.7395 = 11.9738 (full precision; the frontend rounds for display)
+    assert result['threshold'] == pytest.approx(11.9738, abs=1e-4)
     mock_get_history.assert_called_once_with(days=5)
 
 @patch('src.analyzer.get_daily_cost_history')
@@ -131,12 +174,12 @@ def test_analyze_cost_anomalies_not_detected(mock_get_history):
     assert result['is_anomaly'] == False
     assert result['latest_date'] == '2024-01-05'
     assert result['latest_cost'] == 11.5
-    # Avg/StdDev based on first 4 days: (10 + 11 + 9 + 10.5) / 4 = 10.125, rounded to 10.12
-    assert result['average_cost'] == 10.12
-    # StdDev: sqrt(((10-10.125)^2 + (11-10.125)^2 + (9-10.125)^2 + (10.5-10.125)^2) / 4) = 0.7395, rounded to 0.74
-    assert result['std_dev'] == pytest.approx(0.74)
-    # Threshold: 10.12 + 2.5 * 0.74 = 10.12 + 1.85 = 11.97
-    assert result['threshold'] == 11.97
+    # Avg/StdDev based on first 4 days: (10 + 11 + 9 + 10.5) / 4 = 10.125
+    assert result['average_cost'] == pytest.approx(10.125)
+    # StdDev: sqrt(((10-10.125)^2 + (11-10.125)^2 + (9-10.125)^2 + (10.5-10.125)^2) / 4) = 0.7395
+    assert result['std_dev'] == pytest.approx(0.7395, abs=1e-4)
+    # Threshold: 10.125 + 2.5 * 0.7395 = 11.9738 (full precision; the frontend rounds for display)
+    assert result['threshold'] == pytest.approx(11.9738, abs=1e-4)
     mock_get_history.assert_called_once_with(days=5)
 
 @patch('src.analyzer.get_daily_cost_history')
@@ -1,182 +1,194 @@
 import pytest
-from unittest.mock import patch
-import json
+from contextlib import ExitStack
+from unittest.mock import Mock, patch
+from decimal import Decimal
+from src.analyzer import analyze_cost_data, analyze_untagged_resources, clear_caches
+import src.app as app_module # Analyzers are patched on the module object with patch.object
 from src.app import app # Import the Flask app instance
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client():
-    """Create a Flask test client fixture."""
+    """Create a Flask test client, shared by every test (the routes only read mocked analyzers)."""
     app.config['TESTING'] = True
-    with app.test_client() as client:
+    with app.test_client(use_cookies=False) as client: # The API is stateless; skip the cookie jar
         yield client
 
-# --- Test /api/cost-by-service ---
-
-@patch('src.app.analyze_cost_data') # Patch the analyzer function used by the route
-def test_get_cost_by_service_success(mock_analyze, client):
-    """Tests successful response from /api/cost-by-service."""
-    mock_data = {"EC2": 100.0, "S3": 50.0}
-    mock_analyze.return_value = mock_data
+@pytest.fixture(scope="session")
+def warm_templates():
+    """Compiles index.html once per session; later renders reuse Jinja's compiled template cache."""
+    with app.app_context():
+        app.jinja_env.get_template('index.html')
+
+def assert_json(response, status, body=None):
+    """Asserts a JSON response with the given status and body (or an 'error' key when body is None)."""
+    assert response.status_code == status
+    assert response.is_json
+    data = response.get_json()
+    if body is None:
+        assert "error" in data
+    else:
+        assert data == body
+
+# --- Test the single-analyzer /api/* routes ---
+
+# (route, analyzer attribute patched on src.app, payload returned on success)
+ROUTES = [
+    ('/api/cost-by-service', 'analyze_cost_data', {"EC2": 100.0, "S3": 50.0}),
+    ('/api/idle-instances', 'analyze_idle_instances', [{"InstanceId": "i-123", "AvgCPU": 1.0}]),
+    ('/api/untagged-resources', 'analyze_untagged_resources',
+     {"Instances": [{"ResourceId": "i-456", "MissingTags": ["Owner"]}], "Volumes": []}),
+    ('/api/ebs-optimization', 'analyze_ebs_optimization',
+     {"UnattachedVolumes": [{"ResourceId": "vol-123"}], "Gp2Volumes": []}),
+    ('/api/cost-anomalies', 'analyze_cost_anomalies',
+     {'latest_date': '2024-01-05', 'latest_cost': 150.0, 'average_cost': 100.0, 'std_dev': 20.0,
+      'threshold': 150.0, 'is_anomaly': True, 'history_days': 30, 'std_dev_threshold': 2.5}),
+    ('/api/s3-optimization', 'analyze_s3_optimization',
+     {'summary': {'total_buckets': 5}, 'buckets': [], 'optimization_opportunities': []}),
+]
+
+@pytest.mark.parametrize("route, analyzer, payload", ROUTES)
+def test_route_success(client, route, analyzer, payload):
+    """Tests that each route returns its analyzer's result as JSON."""
+    with patch.object(app_module, analyzer, return_value=payload) as mock_analyze:
+        response = client.get(route)
+
+    assert_json(response, 200, payload)
+    mock_analyze.assert_called_once()
 
-    response = client.get('/api/cost-by-service')
+@pytest.mark.parametrize("route, analyzer", [(route, analyzer) for route, analyzer, _ in ROUTES])
+def test_route_failure(client, route, analyzer):
+    """Tests that each route returns a 500 JSON error when its analyzer fails."""
+    with patch.object(app_module, analyzer, return_value=None) as mock_analyze: # Simulate analyzer failure
+        response = client.get(route)
 
-    assert response.status_code == 200
-    assert response.content_type == 'application/json'
-    assert json.loads(response.data) == mock_data
+    assert_json(response, 500)
     mock_analyze.assert_called_once()
 
 @patch('src.app.analyze_cost_data')
-def test_get_cost_by_service_failure(mock_analyze, client):
-    """Tests error response when analyzer fails for cost data."""
-    mock_analyze.return_value = None # Simulate analyzer failure
+def test_get_cost_by_service_non_native_types(mock_analyze, client):
+    """Tests that types orjson can't encode natively fall back to Flask's default conversions."""
+    mock_analyze.return_value = {"EC2": Decimal("100.25")}
 
     response = client.get('/api/cost-by-service')
 
-    assert response.status_code == 500
-    assert response.content_type == 'application/json'
-    assert "error" in json.loads(response.data)
-    mock_analyze.assert_called_once()
-
-# --- Test /api/idle-instances ---
-
-@patch('src.app.analyze_idle_instances')
-def test_get_idle_instances_success(mock_analyze, client):
-    """Tests successful response from /api/idle-instances."""
-    mock_data = [{"InstanceId": "i-123", "AvgCPU": 1.0}]
-    mock_analyze.return_value = mock_data
-
-    response = client.get('/api/idle-instances')
-
-    assert response.status_code == 200
-    assert response.content_type == 'application/json'
-    assert json.loads(response.data) == mock_data
-    mock_analyze.assert_called_once()
-
-@patch('src.app.analyze_idle_instances')
-def test_get_idle_instances_failure(mock_analyze, client):
-    """Tests error response when analyzer fails for idle instances."""
-    mock_analyze.return_value = None
-
-    response = client.get('/api/idle-instances')
+    assert_json(response, 200, {"EC2": "100.25"})
 
-    assert response.status_code == 500
-    assert response.content_type == 'application/json'
-    assert "error" in json.loads(response.data)
-    mock_analyze.assert_called_once()
-
-# --- Test /api/untagged-resources ---
-
-@patch('src.app.analyze_untagged_resources')
-def test_get_untagged_resources_success(mock_analyze, client):
-    """Tests successful response from /api/untagged-resources."""
-    mock_data = {"Instances": [{"ResourceId": "i-456", "MissingTags": ["Owner"]}], "Volumes": []}
-    mock_analyze.return_value = mock_data
-
-    response = client.get('/api/untagged-resources')
+# --- Test / route ---
 
+def test_index_route(client, warm_templates):
+    """Tests that the index route renders the dashboard page and its static asset links."""
+    response = client.get('/')
     assert response.status_code == 200
-    assert response.content_type == 'application/json'
-    assert json.loads(response.data) == mock_data
-    mock_analyze.assert_called_once() # Add assertion for call
-
-@patch('src.app.analyze_untagged_resources')
-def test_get_untagged_resources_failure(mock_analyze, client):
-    """Tests error response when analyzer fails for untagged resources."""
-    mock_analyze.return_value = None
-
-    response = client.get('/api/untagged-resources')
-
-    assert response.status_code == 500
-    assert response.content_type == 'application/json'
-    assert "error" in json.loads(response.data)
-    mock_analyze.assert_called_once() # Add assertion for call
-
-# --- Test /api/ebs-optimization ---
-
-@patch('src.app.analyze_ebs_optimization')
-def test_get_ebs_optimization_success(mock_analyze, client):
-    """Tests successful response from /api/ebs-optimization."""
-    mock_data = {"UnattachedVolumes": [{"ResourceId": "vol-123"}], "Gp2Volumes": []}
-    mock_analyze.return_value = mock_data
-
-    response = client.get('/api/ebs-optimization')
+    assert b'<title>AWS Cost Dashboard</title>' in response.data
+    assert b'/static/script.js' in response.data
+    assert client.get('/static/script.js').status_code == 200
 
-    assert response.status_code == 200
-    assert response.content_type == 'application/json'
-    assert json.loads(response.data) == mock_data
-    mock_analyze.assert_called_once()
+# --- Test /api/dashboard ---
 
+@patch('src.app.analyze_s3_optimization')
+@patch('src.app.analyze_cost_anomalies')
 @patch('src.app.analyze_ebs_optimization')
-def test_get_ebs_optimization_failure(mock_analyze, client):
-    """Tests error response when analyzer fails for EBS optimization."""
-    mock_analyze.return_value = None
-
-    response = client.get('/api/ebs-optimization')
-
-    assert response.status_code == 500
-    assert response.content_type == 'application/json'
-    assert "error" in json.loads(response.data)
-    mock_analyze.assert_called_once()
+@patch('src.app.analyze_untagged_resources')
+@patch('src.app.analyze_idle_instances')
+@patch('src.app.analyze_cost_data')
+def test_get_dashboard_success(mock_cost, mock_idle, mock_untagged, mock_ebs, mock_anomalies, mock_s3, client):
+    """Tests that /api/dashboard combines every analyzer result, with null for failed sections."""
+    mock_cost.return_value = {"EC2": 100.0}
+    mock_idle.return_value = [{"InstanceId": "i-123"}]
+    mock_untagged.return_value = {"Instances": [], "Volumes": []}
+    mock_ebs.return_value = None # Simulate a single failing analyzer
+    mock_anomalies.return_value = {"is_anomaly": False}
+    mock_s3.return_value = {"summary": {"total_buckets": 0}}
+
+    response = client.get('/api/dashboard')
+
+    assert_json(response, 200, {
+        'cost_by_service': {"EC2": 100.0},
+        'idle_instances': [{"InstanceId": "i-123"}],
+        'untagged_resources': {"Instances": [], "Volumes": []},
+        'ebs_optimization': None,
+        'cost_anomalies': {"is_anomaly": False},
+        's3_optimization': {"summary": {"total_buckets": 0}}
+    })
+    for mock_analyze in (mock_cost, mock_idle, mock_untagged, mock_ebs, mock_anomalies, mock_s3):
+        mock_analyze.assert_called_once()
+
+@patch('src.app.analyze_s3_optimization', return_value=None)
+@patch('src.app.analyze_cost_anomalies', return_value=None)
+@patch('src.app.analyze_ebs_optimization', return_value=None)
+@patch('src.app.analyze_untagged_resources', return_value=None)
+@patch('src.app.analyze_idle_instances', return_value=None)
+@patch('src.app.analyze_cost_data', return_value=None)
+def test_get_dashboard_failure(mock_cost, mock_idle, mock_untagged, mock_ebs, mock_anomalies, mock_s3, client):
+    """Tests error response from /api/dashboard when every analyzer fails."""
+    response = client.get('/api/dashboard')
+
+    assert_json(response, 500)
 
-# --- Test /api/cost-anomalies ---
+@pytest.fixture
+def stub_analyzers():
+    """Patches every analyzer used by /api/dashboard to return an empty section."""
+    with ExitStack() as stack:
+        for _, analyzer, _ in ROUTES:
+            stack.enter_context(patch.object(app_module, analyzer, return_value={}))
+        yield
 
-@patch('src.app.analyze_cost_anomalies')
-def test_get_cost_anomalies_success(mock_analyze, client):
-    """Tests successful response from /api/cost-anomalies."""
-    mock_data = {'latest_date': '2024-01-05', 'latest_cost': 150.0, 'average_cost': 100.0, 'std_dev': 20.0, 'threshold': 150.0, 'is_anomaly': True, 'history_days': 30, 'std_dev_threshold': 2.5}
-    mock_analyze.return_value = mock_data
+@patch.object(app_module, 'clear_caches')
+def test_get_dashboard_refresh_clears_caches(mock_clear, client, stub_analyzers):
+    """Tests that ?refresh=1 drops cached results before the analyzers run, and only then."""
+    client.get('/api/dashboard')
+    mock_clear.assert_not_called()
 
-    response = client.get('/api/cost-anomalies')
+    response = client.get('/api/dashboard?refresh=1')
 
     assert response.status_code == 200
-    assert response.content_type == 'application/json'
-    assert json.loads(response.data) == mock_data
-    mock_analyze.assert_called_once()
-
-@patch('src.app.analyze_cost_anomalies')
-def test_get_cost_anomalies_failure(mock_analyze, client):
-    """Tests error response when analyzer fails for cost anomalies."""
-    mock_analyze.return_value = None
+    mock_clear.assert_called_once()
 
-    response = client.get('/api/cost-anomalies')
-
-    assert response.status_code == 500
-    assert response.content_type == 'application/json'
-    assert "error" in json.loads(response.data)
-    mock_analyze.assert_called_once()
-
-# --- Test /api/s3-optimization ---
-
-@patch('src.app.analyze_s3_optimization')
-def test_get_s3_optimization_success(mock_analyze, client):
-    """Tests successful response from /api/s3-optimization."""
-    mock_data = {'summary': {'total_buckets': 5}, 'buckets': [], 'optimization_opportunities': []}
-    mock_analyze.return_value = mock_data
-
-    response = client.get('/api/s3-optimization')
+def test_get_cache_stats(client):
+    """Tests that /api/cache-stats reports the response cache counters (off in the test environment)."""
+    response = client.get('/api/cache-stats')
 
     assert response.status_code == 200
-    assert response.content_type == 'application/json'
-    assert json.loads(response.data) == mock_data
-    mock_analyze.assert_called_once()
-
-@patch('src.app.analyze_s3_optimization')
-def test_get_s3_optimization_failure(mock_analyze, client):
-    """Tests error response when analyzer fails for S3 optimization."""
-    mock_analyze.return_value = None
+    data = response.get_json()
+    assert data['mode'] == 'off' and data['entries'] is None
+    assert {'hits', 'misses', 'writes', 'errors'} <= data.keys()
 
-    response = client.get('/api/s3-optimization')
-
-    assert response.status_code == 500
-    assert response.content_type == 'application/json'
-    assert "error" in json.loads(response.data)
-    mock_analyze.assert_called_once()
-# --- Test / route ---
-
-@patch('src.app.render_template') # Mock render_template to avoid actual rendering
-def test_index_route(mock_render, client):
-    """Tests that the index route returns 200 OK."""
-    mock_render.return_value = "OK" # Return simple string instead of rendered template
-    response = client.get('/')
-    assert response.status_code == 200
-    mock_render.assert_called_once_with('index.html', title='AWS Cost Dashboard')
\ No newline at end of file
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    """Turns the on-disk response cache on, backed by a temporary database, with empty in-process caches."""
+    monkeypatch.setenv('COST_CACHE_MODE', 'on')
+    monkeypatch.setenv('COST_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.delenv('AWS_OPT_CACHE_DISABLE', raising=False)
+    monkeypatch.setattr('src.cache._invalidated_at', 0.0)
+    clear_caches()
+    yield
+    clear_caches()
+
+def test_get_dashboard_refresh_skips_disk_cache(client, disk_cache):
+    """Tests that ?refresh=1 refetches Cost Explorer and inventory data the disk cache already holds."""
+    def cost_response(amount):
+        return {'ResultsByTime': [{'Groups': [{'Keys': ['EC2'], 'Metrics': {'UnblendedCost': {'Amount': amount}}}]}]}
+
+    ce_client = Mock()
+    ce_client.get_cost_and_usage.return_value = cost_response('1.0')
+    list_instances = Mock(return_value=[{'InstanceId': 'i-1', 'StateName': 'running', 'Tags': None}])
+    with ExitStack() as stack:
+        for _, analyzer, _ in ROUTES:
+            if analyzer not in ('analyze_cost_data', 'analyze_untagged_resources'):
+                stack.enter_context(patch.object(app_module, analyzer, return_value={}))
+        stack.enter_context(patch('src.data_fetcher.get_client', return_value=ce_client))
+        stack.enter_context(patch('src.data_fetcher._list_instances', list_instances))
+        stack.enter_context(patch('src.data_fetcher._list_volumes', Mock(return_value=[])))
+
+        first = client.get('/api/dashboard').get_json()
+        ce_client.get_cost_and_usage.return_value = cost_response('2.0')
+        list_instances.return_value = []
+        for analyzer in (analyze_cost_data, analyze_untagged_resources):
+            analyzer.cache_clear() # In-process results only, so the next request is served from disk
+        cached = client.get('/api/dashboard').get_json()
+        refreshed = client.get('/api/dashboard?refresh=1').get_json()
+
+    assert first['cost_by_service'] == cached['cost_by_service'] == {'EC2': 1.0}
+    assert [r['ResourceId'] for r in cached['untagged_resources']['Instances']] == ['i-1']
+    assert refreshed['cost_by_service'] == {'EC2': 2.0}
+    assert refreshed['untagged_resources']['Instances'] == []
@@ -0,0 +1,124 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+from src.cache import cached, cached_call, invalidate, make_key, stats, CacheMiss
+
+@pytest.fixture
+def cache_env(tmp_path, monkeypatch):
+    """Points the response cache at a temporary database."""
+    monkeypatch.setenv('COST_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.delenv('AWS_OPT_CACHE_DISABLE', raising=False)
+    monkeypatch.setattr('src.cache._invalidated_at', 0.0) # Undo invalidate() calls from other tests
+    return monkeypatch
+
+def test_make_key_is_order_independent():
+    """Tests that parameter order does not change the cache key."""
+    assert make_key('ce', {'a': 1, 'b': [1, 2]}) == make_key('ce', {'b': [1, 2], 'a': 1})
+    assert make_key('ce', {'a': 1}) != make_key('ec2', {'a': 1})
+
+def test_cached_call_off_by_default(cache_env):
+    """Tests that the cache is bypassed unless COST_CACHE_MODE is set."""
+    cache_env.delenv('COST_CACHE_MODE', raising=False)
+    fetch = Mock(return_value={'ResultsByTime': []})
+    cached_call('ce', {'days': 30}, 60, fetch)
+    cached_call('ce', {'days': 30}, 60, fetch)
+    assert fetch.call_count == 2
+
+def test_cached_call_on_mode_hit_and_expiry(cache_env):
+    """Tests that stored responses are reused within the TTL and refetched after it."""
+    cache_env.setenv('COST_CACHE_MODE', 'on')
+    fetch = Mock(return_value={'ResultsByTime': [{'Total': 1}]})
+
+    with patch('src.cache.time.time', return_value=1000.0):
+        assert cached_call('ce', {'days': 30}, 60, fetch) == {'ResultsByTime': [{'Total': 1}]}
+        assert cached_call('ce', {'days': 30}, 60, fetch) == {'ResultsByTime': [{'Total': 1}]}
+    assert fetch.call_count == 1
+
+    with patch('src.cache.time.time', return_value=1061.0): # TTL elapsed
+        cached_call('ce', {'days': 30}, 60, fetch)
+    assert fetch.call_count == 2
+
+def test_cached_call_readonly_and_replay(cache_env):
+    """Tests that readonly never writes and replay serves old entries without calling AWS."""
+    cache_env.setenv('COST_CACHE_MODE', 'readonly')
+    fetch = Mock(return_value={'value': 1})
+    cached_call('ce', {'days': 7}, 60, fetch)
+    cached_call('ce', {'days': 7}, 60, fetch)
+    assert fetch.call_count == 2 # Nothing was stored
+
+    cache_env.setenv('COST_CACHE_MODE', 'on')
+    with patch('src.cache.time.time', return_value=0.0):
+        cached_call('ce', {'days': 7}, 60, fetch)
+
+    cache_env.setenv('COST_CACHE_MODE', 'replay')
+    assert cached_call('ce', {'days': 7}, 60, fetch) == {'value': 1} # Stale, but replay ignores the TTL
+    assert fetch.call_count == 3
+    with pytest.raises(CacheMiss):
+        cached_call('ce', {'days': 90}, 60, fetch)
+
+def test_cached_decorator_and_disable(cache_env):
+    """Tests the decorator, the disable switch and stats()."""
+    cache_env.setenv('COST_CACHE_MODE', 'on')
+    fetch = Mock(return_value={'Volumes': []})
+
+    @cached(60)
+    def cached_fetch(**kwargs):
+        return fetch(**kwargs)
+
+    before = stats()
+
+    cached_fetch(region='us-east-1')
+    cached_fetch(region='us-east-1')
+    cached_fetch(region='eu-west-1')
+    assert fetch.call_count == 2
+    fetch.assert_called_with(region='eu-west-1')
+
+    after = stats()
+    assert after['hits'] - before['hits'] == 1
+    assert after['writes'] - before['writes'] == 2
+    assert after['entries'] == 2
+
+    cache_env.setenv('AWS_OPT_CACHE_DISABLE', '1')
+    cached_fetch(region='us-east-1')
+    assert fetch.call_count == 3
+    assert stats()['mode'] == 'off'
+
+def test_cached_decorator_replay_miss_returns_none(cache_env):
+    """Tests that a replay-mode miss behaves like a failed fetch instead of raising."""
+    cache_env.setenv('COST_CACHE_MODE', 'replay')
+    fetch = Mock(return_value={'Volumes': []})
+
+    @cached(60)
+    def cached_fetch(**kwargs):
+        return fetch(**kwargs)
+
+    assert cached_fetch(region='eu-west-1') is None
+    fetch.assert_not_called()
+
+def test_cached_call_round_trips_datetimes_and_unicode(cache_env):
+    """Tests that stored values are orjson-encoded, so datetimes and non-ASCII text survive a hit."""
+    cache_env.setenv('COST_CACHE_MODE', 'on')
+    stamp = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    fetch = Mock(return_value={'Service': 'Amazon Élastic', 'Timestamp': stamp})
+
+    cached_call('cw', {'bucket': 'b'}, 60, fetch)
+    assert cached_call('cw', {'bucket': 'b'}, 60, fetch) == {
+        'Service': 'Amazon Élastic', 'Timestamp': '2024-01-02T00:00:00+00:00'
+    }
+    assert fetch.call_count == 1
+
+def test_invalidate_marks_stored_entries_stale(cache_env):
+    """Tests that entries stored before invalidate() are refetched, while replay still serves them."""
+    cache_env.setenv('COST_CACHE_MODE', 'on')
+    fetch = Mock(return_value={'value': 1})
+    cached_call('ce', {'days': 7}, 60, fetch)
+
+    invalidate()
+    fetch.return_value = {'value': 2}
+    assert cached_call('ce', {'days': 7}, 60, fetch) == {'value': 2}
+    assert cached_call('ce', {'days': 7}, 60, fetch) == {'value': 2} # The refetched entry is fresh
+    assert fetch.call_count == 2
+
+    invalidate()
+    cache_env.setenv('COST_CACHE_MODE', 'replay')
+    assert cached_call('ce', {'days': 7}, 60, fetch) == {'value': 2}
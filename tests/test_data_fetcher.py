@@ -1,31 +1,48 @@
+import threading
 import pytest
-import boto3
-from moto import mock_aws
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-import os
 from unittest.mock import patch, Mock # Import Mock
 
-# Ensure AWS credentials are set for moto even if not real
-# Moto uses these env vars by default
-os.environ["AWS_ACCESS_KEY_ID"] = "testing"
-os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
-os.environ["AWS_SECURITY_TOKEN"] = "testing"
-os.environ["AWS_SESSION_TOKEN"] = "testing"
-os.environ["AWS_DEFAULT_REGION"] = "us-east-1" # Match default in connector
-
-# Now import our modules AFTER setting mock env vars
-from data_fetcher import (
+# Fake AWS credentials and the cache switch are set by the aws_test_env fixture in conftest.py
+from src.data_fetcher import (
     get_cost_by_service, get_idle_ec2_instances, get_untagged_resources,
-    get_ebs_optimization_candidates, get_daily_cost_history, # Import new functions
+    get_ebs_optimization_candidates, get_daily_cost_history, fetch_all, # Import new functions
+    get_idle_ec2_instances_all_regions,
     IDLE_CHECK_PERIOD_DAYS, IDLE_AVG_CPU_THRESHOLD, IDLE_MAX_CPU_THRESHOLD, CW_PERIOD_SECONDS,
-    REQUIRED_TAGS # Import the default required tags
+    REQUIRED_TAGS, # Import the default required tags
+    METRIC_DATA_MAX_QUERIES, _fetch_cpu_values,
+    _describe_by_az, _list_instances, _list_volumes, INSTANCES_EXPRESSION, _idle_window,
+    INSTANCE_PAGE_SIZE, VOLUME_PAGE_SIZE, clear_inventory_cache
 )
-from aws_connector import AWS_REGION # Import the region used by default
+from src.aws_connector import AWS_REGION # Import the region used by default
+from src.utils import PartialResult
+
+@pytest.fixture(autouse=True)
+def clear_inventory_caches():
+    """Each test builds its own moto account, so never reuse a cached instance or volume scan."""
+    clear_inventory_cache()
+    yield
+    clear_inventory_cache()
+
+@pytest.fixture
+def mock_get_client(monkeypatch):
+    """Replaces the get_client used by data_fetcher with a Mock for the duration of a test."""
+    mock = Mock()
+    monkeypatch.setattr('src.data_fetcher.get_client', mock)
+    return mock
+
+@pytest.fixture
+def short_idle_window(monkeypatch):
+    """Shrinks the idle look-back to 2 days for tests that don't exercise the windowing itself."""
+    monkeypatch.setattr('src.data_fetcher.IDLE_CHECK_PERIOD_DAYS', 2)
+    _idle_window.cache_clear() # The window is memoized per day, so drop any default-length one
+    yield 2
+    _idle_window.cache_clear()
 
 # --- Test get_cost_by_service ---
 
-@mock_aws
-def test_get_cost_by_service_success():
+def test_get_cost_by_service_success(mock_get_client):
     """Tests successful cost fetching using patched src.data_fetcher.get_client."""
     # NOTE: Moto's CE support is limited. This test relies on patching.
     mock_response = {
@@ -42,131 +59,309 @@ def test_get_cost_by_service_success():
         'ResponseMetadata': {}
     }
 
-    # Patch the get_client function *within the data_fetcher module*
-    with patch('src.data_fetcher.get_client') as mock_get_client:
-        # Configure the mock client instance returned by get_client('ce', ...)
-        mock_ce_instance = Mock() # Use a simple Mock
-        mock_ce_instance.get_cost_and_usage.return_value = mock_response
-        mock_get_client.return_value = mock_ce_instance # Directly return the mock
+    # Configure the mock client instance returned by get_client('ce', ...)
+    mock_ce_instance = Mock() # Use a simple Mock
+    mock_ce_instance.get_cost_and_usage.return_value = mock_response
+    mock_get_client.return_value = mock_ce_instance # Directly return the mock
+
+    costs = get_cost_by_service(days=30)
+
+    assert costs is not None
+    assert len(costs) == 2 # Zero cost service should be excluded
+    assert costs['Amazon Elastic Compute Cloud - Compute'] == 150.75
+    assert costs['Amazon Simple Storage Service'] == 25.50
+    # Assert that our get_client helper was called correctly
+    mock_get_client.assert_called_with('ce')
+    mock_ce_instance.get_cost_and_usage.assert_called_once()
+
+
+def test_get_cost_by_service_paginated(mock_get_client):
+    """Tests that costs from every NextPageToken page are combined."""
+    first_page = {
+        'ResultsByTime': [{
+            'TimePeriod': {'Start': '2023-01-01', 'End': '2023-02-01'},
+            'Groups': [{'Keys': ['AWS Lambda'], 'Metrics': {'UnblendedCost': {'Amount': '10.00', 'Unit': 'USD'}}}],
+        }],
+        'NextPageToken': 'token-2'
+    }
+    second_page = {
+        'ResultsByTime': [{
+            'TimePeriod': {'Start': '2023-02-01', 'End': '2023-03-01'},
+            'Groups': [
+                {'Keys': ['AWS Lambda'], 'Metrics': {'UnblendedCost': {'Amount': '5.25', 'Unit': 'USD'}}},
+                {'Keys': ['Amazon DynamoDB'], 'Metrics': {'UnblendedCost': {'Amount': '3.00', 'Unit': 'USD'}}},
+            ],
+        }]
+    }
+
+    mock_ce_instance = Mock()
+    mock_ce_instance.get_cost_and_usage.side_effect = [first_page, second_page]
+    mock_get_client.return_value = mock_ce_instance
 
-        costs = get_cost_by_service(days=30)
+    costs = get_cost_by_service(days=60)
 
-        assert costs is not None
-        assert len(costs) == 2 # Zero cost service should be excluded
-        assert costs['Amazon Elastic Compute Cloud - Compute'] == 150.75
-        assert costs['Amazon Simple Storage Service'] == 25.50
-        # Assert that our get_client helper was called correctly
-        mock_get_client.assert_called_with('ce')
-        mock_ce_instance.get_cost_and_usage.assert_called_once()
+    assert costs == {'AWS Lambda': 15.25, 'Amazon DynamoDB': 3.0}
+    assert mock_ce_instance.get_cost_and_usage.call_count == 2
+    assert mock_ce_instance.get_cost_and_usage.call_args.kwargs['NextPageToken'] == 'token-2'
 
 
-@mock_aws
-def test_get_cost_by_service_failure():
+def test_get_cost_by_service_failure(mock_get_client):
     """Tests handling of Cost Explorer API errors."""
-    # Patch src.data_fetcher.get_client
-    with patch('src.data_fetcher.get_client') as mock_get_client:
-        # Configure the mock client instance to raise an exception
-        mock_ce_instance = Mock() # Use a simple Mock
-        mock_ce_instance.get_cost_and_usage.side_effect = Exception("AWS API Error")
-        mock_get_client.return_value = mock_ce_instance # Directly return the mock
+    # Configure the mock client instance to raise an exception
+    mock_ce_instance = Mock() # Use a simple Mock
+    mock_ce_instance.get_cost_and_usage.side_effect = Exception("AWS API Error")
+    mock_get_client.return_value = mock_ce_instance # Directly return the mock
 
-        costs = get_cost_by_service(days=30)
-        # The function returns None on exception, so this assertion is correct.
-        assert costs is None
+    costs = get_cost_by_service(days=30)
+    # The function returns None on exception, so this assertion is correct.
+    assert costs is None
 
 
 # --- Test get_idle_ec2_instances ---
 
-@mock_aws
-def test_get_idle_ec2_instances_mixed():
+@pytest.mark.slow
+def test_get_idle_ec2_instances_mixed(aws, short_idle_window, mock_get_client):
     """
-    Tests identifying idle and non-idle instances by patching get_metric_statistics.
+    Tests identifying idle and non-idle instances by patching get_metric_data.
     """
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = aws["ec2"]
 
     # Create instances
     instance_idle = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
     instance_active = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
     instance_no_metrics = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
 
-    # Wait for instances to be 'running' (moto state) - still needed for describe_instances
-    waiter = ec2_client.get_waiter('instance_running')
-    waiter.wait(InstanceIds=[instance_idle, instance_active, instance_no_metrics])
+    # No waiter needed: moto puts new instances in 'running' synchronously
+
+    # Define mocked metric values per instance and statistic
+    metric_values = {
+        instance_idle: {
+            'Average': [IDLE_AVG_CPU_THRESHOLD - 1] * short_idle_window,
+            'Maximum': [IDLE_MAX_CPU_THRESHOLD - 1] * short_idle_window,
+        },
+        instance_active: {
+            'Average': [IDLE_AVG_CPU_THRESHOLD + 20] * short_idle_window,
+            'Maximum': [IDLE_MAX_CPU_THRESHOLD + 20] * short_idle_window,
+        },
+        instance_no_metrics: {'Average': [], 'Maximum': []},
+    }
+
+    # mock_get_client returns the real moto EC2 client and a mocked CloudWatch client
+    # Create a standard mock for the CloudWatch client
+    mock_cw_instance = Mock()
+
+    # Answer every query in the batched request from metric_values
+    def metric_data_side_effect(*args, **kwargs):
+        results = []
+        for query in kwargs['MetricDataQueries']:
+            stat = query['MetricStat']
+            instance_id = stat['Metric']['Dimensions'][0]['Value']
+            results.append({
+                'Id': query['Id'],
+                'Values': metric_values.get(instance_id, {}).get(stat['Stat'], []),
+                'StatusCode': 'Complete'
+            })
+        return {'MetricDataResults': results}
+    mock_cw_instance.get_metric_data.side_effect = metric_data_side_effect
+
+    # Configure get_client to return the appropriate mock/client
+    def client_side_effect(service_name, region_name=None):
+        # We ignore region_name here as mocks are pre-configured
+        if service_name == 'ec2':
+            # Return the *actual* moto EC2 client for describe_instances
+            return aws["ec2"]
+        elif service_name == 'cloudwatch':
+            # Return our configured mock CW client
+            return mock_cw_instance
+        return None
+    mock_get_client.side_effect = client_side_effect
+
+    idle_list = get_idle_ec2_instances(region=region)
 
-    # Define mocked metric responses
-    idle_metrics = {
-        'Datapoints': [
-            {'Average': IDLE_AVG_CPU_THRESHOLD - 1, 'Maximum': IDLE_MAX_CPU_THRESHOLD - 1, 'Timestamp': datetime.now(timezone.utc)}
-        ] * IDLE_CHECK_PERIOD_DAYS # Simulate data for the period
+    assert idle_list is not None
+    assert len(idle_list) == 1
+    assert idle_list[0]['InstanceId'] == instance_idle
+    assert idle_list[0]['AvgCPU'] < IDLE_AVG_CPU_THRESHOLD
+    assert idle_list[0]['MaxCPU'] < IDLE_MAX_CPU_THRESHOLD
+    assert f"over last {short_idle_window} days" in idle_list[0]['Reason']
+    # One Average request covers all three instances; Maximum is only fetched for the idle candidate
+    assert mock_cw_instance.get_metric_data.call_count == 2
+    average_call, maximum_call = mock_cw_instance.get_metric_data.call_args_list
+    assert len(average_call.kwargs['MetricDataQueries']) == 3
+    assert [q['MetricStat']['Metric']['Dimensions'][0]['Value'] for q in maximum_call.kwargs['MetricDataQueries']] == [instance_idle]
+    mock_cw_instance.get_metric_statistics.assert_not_called()
+
+
+def test_fetch_cpu_values_batches_and_paginates():
+    """Tests that metric queries are split into batches and NextToken pages are merged."""
+    instance_ids = [f"i-{n:017x}" for n in range(METRIC_DATA_MAX_QUERIES + 1)]
+    calls = []
+
+    def metric_data_side_effect(*args, **kwargs):
+        calls.append(kwargs)
+        assert len(kwargs['MetricDataQueries']) <= METRIC_DATA_MAX_QUERIES
+        values = [2.0] if 'NextToken' not in kwargs else [4.0]
+        response = {'MetricDataResults': [{'Id': q['Id'], 'Values': values} for q in kwargs['MetricDataQueries']]}
+        if 'NextToken' not in kwargs and len(calls) == 1:
+            response['NextToken'] = 'page-2'
+        return response
+
+    mock_cw = Mock()
+    mock_cw.get_metric_data.side_effect = metric_data_side_effect
+    end_time = datetime.now(timezone.utc)
+    values = _fetch_cpu_values(mock_cw, instance_ids, end_time - timedelta(days=1), end_time, 'Average')
+
+    # First batch takes two pages, the single leftover instance takes one request
+    assert len(calls) == 3
+    assert calls[1]['NextToken'] == 'page-2'
+    assert len(calls[2]['MetricDataQueries']) == 1
+    assert {q['MetricStat']['Stat'] for q in calls[0]['MetricDataQueries']} == {'Average'}
+    assert values[instance_ids[0]] == [2.0, 4.0]
+    assert values[instance_ids[-1]] == [2.0]
+
+
+def test_idle_window_aligned_to_utc_midnight():
+    """Tests that the idle window covers whole UTC days and is reused within a day."""
+    day = datetime(2024, 3, 15, tzinfo=timezone.utc).date()
+    start_time, end_time = _idle_window(day)
+
+    assert end_time == datetime(2024, 3, 15, tzinfo=timezone.utc)
+    assert end_time - start_time == timedelta(days=IDLE_CHECK_PERIOD_DAYS)
+    assert _idle_window(day) is _idle_window(day)
+
+def test_describe_by_az_covers_all_zones(aws):
+    """Tests that the per-AZ scan returns instances from every zone exactly once."""
+    ec2_client = aws["ec2"]
+    expected_ids = set()
+    for zone in ['us-east-1a', 'us-east-1b', 'us-east-1c']:
+        reservation = ec2_client.run_instances(ImageId='ami-123456', MinCount=2, MaxCount=2, Placement={'AvailabilityZone': zone})
+        expected_ids.update(i['InstanceId'] for i in reservation['Instances'])
+
+    instances = _describe_by_az(ec2_client, 'describe_instances', INSTANCES_EXPRESSION)
+    instance_ids = [instance['InstanceId'] for instance in instances]
+
+    assert len(instance_ids) == len(expected_ids)
+    assert set(instance_ids) == expected_ids
+
+
+def test_describe_by_az_falls_back_to_single_scan():
+    """Tests that a failing AZ lookup falls back to one region-wide paginator."""
+    mock_ec2 = Mock()
+    mock_ec2.describe_availability_zones.side_effect = Exception("AccessDenied")
+    mock_ec2.get_paginator.return_value.paginate.return_value.search.return_value = iter([
+        {'InstanceId': 'i-1'}, {'InstanceId': 'i-2'}
+    ])
+
+    instances = _describe_by_az(mock_ec2, 'describe_instances', INSTANCES_EXPRESSION)
+
+    assert [i['InstanceId'] for i in instances] == ['i-1', 'i-2']
+    mock_ec2.get_paginator.return_value.paginate.assert_called_once_with(Filters=[], PaginationConfig={})
+    mock_ec2.get_paginator.return_value.paginate.return_value.search.assert_called_once_with(INSTANCES_EXPRESSION)
+
+def test_describe_calls_request_maximum_page_size():
+    """Tests that instance and volume scans ask EC2 for its largest page sizes."""
+    mock_ec2 = Mock()
+    mock_ec2.describe_availability_zones.return_value = {'AvailabilityZones': [{'ZoneName': 'us-east-1a'}]}
+    mock_ec2.get_paginator.return_value.paginate.return_value.search.return_value = iter([])
+
+    with patch('src.data_fetcher.get_client', return_value=mock_ec2):
+        _list_instances(AWS_REGION)
+        get_ebs_optimization_candidates(region=AWS_REGION)
+
+    page_sizes = {
+        c.args[0]: p.kwargs['PaginationConfig']
+        for c, p in zip(mock_ec2.get_paginator.call_args_list, mock_ec2.get_paginator.return_value.paginate.call_args_list)
     }
-    active_metrics = {
-        'Datapoints': [
-            {'Average': IDLE_AVG_CPU_THRESHOLD + 20, 'Maximum': IDLE_MAX_CPU_THRESHOLD + 20, 'Timestamp': datetime.now(timezone.utc)}
-        ] * IDLE_CHECK_PERIOD_DAYS
+    assert page_sizes == {
+        'describe_instances': {'PageSize': INSTANCE_PAGE_SIZE},
+        'describe_volumes': {'PageSize': VOLUME_PAGE_SIZE},
     }
-    no_metrics_response = {'Datapoints': []}
-
-    # Patch src.data_fetcher.get_client to return specific mocks
-    with patch('src.data_fetcher.get_client') as mock_get_client:
-        # Create a standard mock for the CloudWatch client
-        mock_cw_instance = Mock()
-
-        # Configure the side effect for get_metric_statistics on the mock CW client
-        def metric_side_effect(*args, **kwargs):
-            dimensions = kwargs.get('Dimensions', [])
-            instance_id_dim = next((d['Value'] for d in dimensions if d['Name'] == 'InstanceId'), None)
-            if instance_id_dim == instance_idle:
-                return idle_metrics
-            elif instance_id_dim == instance_active:
-                return active_metrics
-            elif instance_id_dim == instance_no_metrics:
-                return no_metrics_response
-            else:
-                # Default for unexpected calls, helps debugging
-                print(f"WARN: Unexpected get_metric_statistics call for dimensions: {dimensions}")
-                return {'Datapoints': []}
-        mock_cw_instance.get_metric_statistics.side_effect = metric_side_effect
-
-        # Configure get_client to return the appropriate mock/client
-        def client_side_effect(service_name, region_name=None):
-            # We ignore region_name here as mocks are pre-configured
-            if service_name == 'ec2':
-                # Return the *actual* moto EC2 client for describe_instances
-                return boto3.client('ec2', region_name=region)
-            elif service_name == 'cloudwatch':
-                # Return our configured mock CW client
-                return mock_cw_instance
-            return None
-        mock_get_client.side_effect = client_side_effect
+    assert INSTANCE_PAGE_SIZE == 1000 and VOLUME_PAGE_SIZE == 500 # EC2's documented maximums
+
+def test_instance_scan_shared_between_idle_and_untagged_checks(aws):
+    """Tests that the idle and tag checks reuse one describe_instances scan."""
+    ec2_client = aws["ec2"]
+    running_id = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+    stopped_id = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+    ec2_client.stop_instances(InstanceIds=[stopped_id])
+
+    with patch('src.data_fetcher._describe_by_az', wraps=_describe_by_az) as spy, \
+         patch('src.data_fetcher._fetch_cpu_values', return_value={}) as mock_fetch_cpu:
+        get_idle_ec2_instances(region=AWS_REGION)
+        untagged = get_untagged_resources(region=AWS_REGION)
 
-        idle_list = get_idle_ec2_instances(region=region)
+    instance_scans = [c for c in spy.call_args_list if c.args[1] == 'describe_instances']
+    assert len(instance_scans) == 1
+    # The idle check only looks at running instances; the tag check sees both
+    assert mock_fetch_cpu.call_args_list[0].args[1] == [running_id]
+    assert {r['ResourceId'] for r in untagged['Instances']} == {running_id, stopped_id}
+
+def slow_describe_by_az(*args, **kwargs):
+    """Wraps _describe_by_az with a short delay so concurrent checks overlap inside the scan."""
+    threading.Event().wait(0.2)
+    return _describe_by_az(*args, **kwargs)
+
+def test_instance_scan_shared_between_concurrent_idle_and_untagged_checks(aws):
+    """Tests that idle and tag checks running in parallel (as in fetch_all) share one describe_instances scan."""
+    ec2_client = aws["ec2"]
+    instance_id = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+
+    with patch('src.data_fetcher._describe_by_az', side_effect=slow_describe_by_az) as spy, \
+         patch('src.data_fetcher._fetch_cpu_values', return_value={}):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            idle = executor.submit(get_idle_ec2_instances, region=AWS_REGION)
+            untagged = executor.submit(get_untagged_resources, region=AWS_REGION)
+            assert idle.result() == []
+            assert [r['ResourceId'] for r in untagged.result()['Instances']] == [instance_id]
+
+    instance_scans = [c for c in spy.call_args_list if c.args[1] == 'describe_instances']
+    assert len(instance_scans) == 1
+
+def test_volume_scan_shared_between_untagged_and_ebs_checks(aws):
+    """Tests that the untagged-resource and EBS checks reuse one describe_volumes scan."""
+    ec2_client = aws["ec2"]
+    volume_id = ec2_client.create_volume(AvailabilityZone='us-east-1a', Size=10, VolumeType='gp2')['VolumeId']
+
+    with patch('src.data_fetcher._describe_by_az', wraps=_describe_by_az) as spy:
+        untagged = get_untagged_resources(region=AWS_REGION)
+        ebs_opts = get_ebs_optimization_candidates(region=AWS_REGION)
+
+    volume_scans = [c for c in spy.call_args_list if c.args[1] == 'describe_volumes']
+    assert len(volume_scans) == 1
+    assert [v['ResourceId'] for v in untagged['Volumes']] == [volume_id]
+    assert [v['ResourceId'] for v in ebs_opts['Gp2Volumes']] == [volume_id]
+
+def test_volume_scan_shared_between_concurrent_untagged_and_ebs_checks(aws):
+    """Tests that tag and EBS checks running in parallel (as in /api/dashboard) share one describe_volumes scan."""
+    ec2_client = aws["ec2"]
+    volume_id = ec2_client.create_volume(AvailabilityZone='us-east-1a', Size=10, VolumeType='gp2')['VolumeId']
 
-        assert idle_list is not None
-        assert len(idle_list) == 1
-        assert idle_list[0]['InstanceId'] == instance_idle
-        assert idle_list[0]['AvgCPU'] < IDLE_AVG_CPU_THRESHOLD
-        assert idle_list[0]['MaxCPU'] < IDLE_MAX_CPU_THRESHOLD
+    with patch('src.data_fetcher._describe_by_az', side_effect=slow_describe_by_az) as spy:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            untagged = executor.submit(get_untagged_resources, region=AWS_REGION)
+            ebs_opts = executor.submit(get_ebs_optimization_candidates, region=AWS_REGION)
+            assert [v['ResourceId'] for v in untagged.result()['Volumes']] == [volume_id]
+            assert [v['ResourceId'] for v in ebs_opts.result()['Gp2Volumes']] == [volume_id]
 
+    volume_scans = [c for c in spy.call_args_list if c.args[1] == 'describe_volumes']
+    assert len(volume_scans) == 1
 
-@mock_aws
-def test_get_idle_ec2_instances_no_running():
+def test_get_idle_ec2_instances_no_running(aws):
     """Tests behavior when no running instances are found."""
     region = AWS_REGION
     # No instances created
     idle_list = get_idle_ec2_instances(region=region)
     assert idle_list == []
 
-@mock_aws
-def test_get_idle_ec2_instances_api_error():
+def test_get_idle_ec2_instances_api_error(aws, mock_get_client):
     """Tests handling of EC2 describe_instances errors."""
-    # Patch the get_paginator method specifically for the ec2 client
-    with patch('src.data_fetcher.get_client') as mock_get_client, \
-         patch('botocore.client.BaseClient._make_api_call') as mock_api_call:
+    # Patch the low-level API call so DescribeInstances fails inside the paginator
+    with patch('botocore.client.BaseClient._make_api_call') as mock_api_call:
 
         # Simulate get_client returning a valid EC2 client initially
-        mock_ec2_client = boto3.client('ec2', region_name=AWS_REGION)
-        mock_cw_client = boto3.client('cloudwatch', region_name=AWS_REGION)
+        mock_ec2_client = aws["ec2"]
+        mock_cw_client = aws["cw"]
         def client_side_effect(service_name, region_name=None):
             if service_name == 'ec2':
                 return mock_ec2_client
@@ -185,6 +380,22 @@ def test_get_idle_ec2_instances_api_error():
         idle_list = get_idle_ec2_instances(region=AWS_REGION)
         assert idle_list is None # Expect None because the API call failed
 
+@patch('src.data_fetcher.get_idle_ec2_instances')
+def test_get_idle_ec2_instances_all_regions(mock_get_idle):
+    """Tests that regions are scanned independently and failed regions are skipped."""
+    def idle_side_effect(region):
+        if region == 'eu-west-1':
+            return None # Simulate a failed region
+        if region == 'ap-south-1':
+            raise Exception("Unexpected error")
+        return [{'InstanceId': f'i-{region}', 'Region': region}]
+    mock_get_idle.side_effect = idle_side_effect
+
+    idle_list = get_idle_ec2_instances_all_regions(['us-east-1', 'eu-west-1', 'ap-south-1', 'us-west-2'])
+
+    assert sorted(item['InstanceId'] for item in idle_list) == ['i-us-east-1', 'i-us-west-2']
+    assert mock_get_idle.call_count == 4
+
 # Add tests for CloudWatch errors, edge cases in metrics, etc.
 
 
@@ -192,14 +403,14 @@ def test_get_idle_ec2_instances_api_error():
 
 # Use the default REQUIRED_TAGS from the module for most tests
 DEFAULT_REQUIRED_TAGS = REQUIRED_TAGS
-DEFAULT_REQUIRED_TAGS_SET = set(DEFAULT_REQUIRED_TAGS)
+DEFAULT_REQUIRED_TAGS_SORTED = sorted(DEFAULT_REQUIRED_TAGS) # MissingTags lists come back sorted
 
 @pytest.mark.xfail(reason="Suspected moto state leakage with volumes between tests.")
-@mock_aws
-def test_get_untagged_resources_mixed():
+@pytest.mark.slow
+def test_get_untagged_resources_mixed(aws):
     """Tests finding various tagged/untagged instances and volumes."""
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = aws["ec2"]
 
     # --- Setup Resources ---
     # Instance: Fully tagged
@@ -238,11 +449,11 @@ def test_get_untagged_resources_mixed():
     assert instance_ids_found == {inst_missing_owner, inst_missing_all, inst_no_tags}
     for item in untagged['Instances']:
         if item['ResourceId'] == inst_missing_owner:
-            assert item['MissingTags'] == ['Owner'] # Order might vary, convert to set if needed
+            assert item['MissingTags'] == ['Owner']
         elif item['ResourceId'] == inst_missing_all:
-            assert set(item['MissingTags']) == DEFAULT_REQUIRED_TAGS_SET
+            assert item['MissingTags'] == DEFAULT_REQUIRED_TAGS_SORTED
         elif item['ResourceId'] == inst_no_tags:
-            assert set(item['MissingTags']) == DEFAULT_REQUIRED_TAGS_SET
+            assert item['MissingTags'] == DEFAULT_REQUIRED_TAGS_SORTED
 
     # Volumes
     assert len(untagged['Volumes']) == 2
@@ -252,15 +463,15 @@ def test_get_untagged_resources_mixed():
         if item['ResourceId'] == vol_missing_project:
             assert item['MissingTags'] == ['Project']
         elif item['ResourceId'] == vol_no_tags:
-            assert set(item['MissingTags']) == DEFAULT_REQUIRED_TAGS_SET
+            assert item['MissingTags'] == DEFAULT_REQUIRED_TAGS_SORTED
 
 
 @pytest.mark.xfail(reason="Suspected moto state leakage with volumes between tests.")
-@mock_aws
-def test_get_untagged_resources_custom_tags():
+@pytest.mark.slow
+def test_get_untagged_resources_custom_tags(aws):
     """Tests finding resources with a custom set of required tags."""
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = aws["ec2"]
     custom_tags = ['Environment', 'CostCenter']
 
     # Instance: Has default tags, missing custom
@@ -283,33 +494,30 @@ def test_get_untagged_resources_custom_tags():
 
     for item in untagged['Instances']:
         if item['ResourceId'] == inst_missing_custom:
-            assert set(item['MissingTags']) == set(custom_tags)
+            assert item['MissingTags'] == sorted(custom_tags)
         elif item['ResourceId'] == inst_has_one_custom:
              assert item['MissingTags'] == ['CostCenter']
 
     assert len(untagged['Volumes']) == 0 # No volumes created in this test
 
 
-@mock_aws
-def test_get_untagged_resources_no_resources():
+def test_get_untagged_resources_no_resources(aws):
     """Tests behavior when no instances or volumes exist."""
     region = AWS_REGION
     untagged = get_untagged_resources(region=region)
     assert untagged == {'Instances': [], 'Volumes': []}
 
 
-@mock_aws
-def test_get_untagged_resources_no_required_tags():
+def test_get_untagged_resources_no_required_tags(aws):
     """Tests behavior when required_tags list is empty."""
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = aws["ec2"]
     ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1) # Create one instance
 
     untagged = get_untagged_resources(required_tags=[], region=region)
     assert untagged == {'Instances': [], 'Volumes': []}
 
 
-@mock_aws
 def test_get_untagged_resources_instance_api_error():
     """Tests handling of EC2 describe_instances errors during tag check."""
     # Patch the specific API call made by the paginator
@@ -327,57 +535,64 @@ def test_get_untagged_resources_instance_api_error():
         assert untagged is None # Should fail early if instance check fails
 
 
-@mock_aws
-def test_get_untagged_resources_volume_api_error():
-    """Tests handling of EC2 describe_volumes errors during tag check."""
+def test_get_untagged_resources_volume_api_error(aws):
+    """Tests that a describe_volumes failure still returns the instance results."""
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
-    # Create an instance so the first part passes
-    ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)
-
-    # We need to patch the paginator specifically for describe_volumes
-    with patch.object(boto3.client('ec2', region_name=region), 'get_paginator') as mock_get_paginator:
-        # Mock the paginator returned for describe_instances
-        mock_inst_paginator = mock_get_paginator.return_value
-        mock_inst_paginator.paginate.return_value = ec2_client.describe_instances()['Reservations'] # Simulate normal instance return
-
-        # Set up the mock for describe_volumes to raise an error
-        def paginator_side_effect(operation_name, **kwargs):
-            if operation_name == 'describe_instances':
-                 # Return a mock paginator that works for instances
-                 mock_pag = patch.object(boto3.client('ec2').get_paginator('describe_instances'), 'paginate')
-                 mock_pag.paginate.return_value = ec2_client.describe_instances()['Reservations']
-                 return mock_pag
-            elif operation_name == 'describe_volumes':
-                raise Exception("Volume API Error")
-            else:
-                # Call original if needed for other paginators
-                return boto3.client('ec2', region_name=region).get_paginator(operation_name, **kwargs)
-
-        mock_get_paginator.side_effect = paginator_side_effect
-
-        # This test setup is complex due to patching paginators.
-        # A simpler approach might be patching describe_volumes directly if paginator patching is too tricky.
-        # For now, let's assume the fetcher handles the volume error gracefully.
-        # Re-checking the implementation: it logs the error but continues.
+    ec2_client = aws["ec2"]
+    instance_id = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
 
-        untagged = get_untagged_resources(region=AWS_REGION)
+    # Delegate to the moto client, except that the volume paginator fails
+    def get_paginator(operation_name):
+        if operation_name == 'describe_volumes':
+            raise Exception("Volume API Error")
+        return ec2_client.get_paginator(operation_name)
+
+    failing_ec2 = Mock()
+    failing_ec2.get_paginator.side_effect = get_paginator
+    failing_ec2.describe_availability_zones.side_effect = ec2_client.describe_availability_zones
+
+    with patch('src.data_fetcher.get_client', return_value=failing_ec2):
+        untagged = get_untagged_resources(region=region)
+
+    assert untagged is not None
+    assert [i['ResourceId'] for i in untagged['Instances']] == [instance_id]
+    assert untagged['Volumes'] == [] # The instance's root volume is not reported because the scan failed
 
-        # Expecting partial results (instances checked, volumes failed)
-        assert untagged is not None
-        assert 'Instances' in untagged # Instance check should have completed
-        assert 'Volumes' in untagged # Volumes list should exist, even if empty due to error
-        # We can't easily assert the error was logged here without capturing logs
-        # But we assert the function didn't return None entirely.
+def test_get_untagged_resources_partial_result_not_cached(aws, tmp_path, monkeypatch):
+    """Tests that a failed volume scan is not stored in the on-disk cache, so the next call recovers."""
+    monkeypatch.setenv('COST_CACHE_MODE', 'on')
+    monkeypatch.setenv('COST_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.delenv('AWS_OPT_CACHE_DISABLE', raising=False)
+    monkeypatch.setattr('src.cache._invalidated_at', 0.0)
+    ec2_client = aws["ec2"]
+    volume_id = ec2_client.create_volume(AvailabilityZone='us-east-1a', Size=10)['VolumeId']
+
+    def get_paginator(operation_name):
+        if operation_name == 'describe_volumes':
+            raise Exception("Throttling")
+        return ec2_client.get_paginator(operation_name)
+
+    failing_ec2 = Mock()
+    failing_ec2.get_paginator.side_effect = get_paginator
+    failing_ec2.describe_availability_zones.side_effect = ec2_client.describe_availability_zones
+
+    with patch('src.data_fetcher.get_client', return_value=failing_ec2):
+        degraded = get_untagged_resources(region=AWS_REGION)
+    assert isinstance(degraded, PartialResult) and degraded['Volumes'] == []
+
+    clear_inventory_cache()
+    recovered = get_untagged_resources(region=AWS_REGION)
+    assert not isinstance(recovered, PartialResult)
+    assert [v['ResourceId'] for v in recovered['Volumes']] == [volume_id]
 
 
 # --- Test get_ebs_optimization_candidates ---
 
-@mock_aws
-def test_get_ebs_optimization_candidates_mixed():
+@pytest.mark.slow
+def test_get_ebs_optimization_candidates_mixed(aws):
     """Tests finding unattached and gp2 volumes."""
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = aws["ec2"]
 
     # Create volumes
     vol_unattached = ec2_client.create_volume(AvailabilityZone=f'{region}a', Size=10, VolumeType='gp3')['VolumeId'] # State defaults to 'available'
@@ -387,13 +602,9 @@ def test_get_ebs_optimization_candidates_mixed():
 
     # Attach some volumes (need an instance)
     instance = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
-    waiter = ec2_client.get_waiter('instance_running')
-    waiter.wait(InstanceIds=[instance])
     ec2_client.attach_volume(VolumeId=vol_gp2_attached, InstanceId=instance, Device='/dev/sdf')
     ec2_client.attach_volume(VolumeId=vol_gp3_attached, InstanceId=instance, Device='/dev/sdg')
-    # Wait for attachments (optional, but good practice)
-    vol_waiter = ec2_client.get_waiter('volume_in_use')
-    vol_waiter.wait(VolumeIds=[vol_gp2_attached, vol_gp3_attached])
+    # Moto marks attached volumes 'in-use' immediately, so no volume_in_use waiter is needed
 
 
     candidates = get_ebs_optimization_candidates(region=region)
@@ -412,19 +623,14 @@ def test_get_ebs_optimization_candidates_mixed():
     assert vol_gp2_unattached in gp2_ids
 
 
-@mock_aws
-def test_get_ebs_optimization_candidates_none():
+def test_get_ebs_optimization_candidates_none(aws):
     """Tests behavior when no volumes are candidates."""
     region = AWS_REGION
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = aws["ec2"]
     # Create only attached gp3 volumes
     instance = ec2_client.run_instances(ImageId='ami-123456', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
-    waiter = ec2_client.get_waiter('instance_running')
-    waiter.wait(InstanceIds=[instance])
     vol1 = ec2_client.create_volume(AvailabilityZone=f'{region}a', Size=10, VolumeType='gp3')['VolumeId']
     ec2_client.attach_volume(VolumeId=vol1, InstanceId=instance, Device='/dev/sdf')
-    vol_waiter = ec2_client.get_waiter('volume_in_use')
-    vol_waiter.wait(VolumeIds=[vol1])
 
     candidates = get_ebs_optimization_candidates(region=region)
 
@@ -436,22 +642,19 @@ def test_get_ebs_optimization_candidates_none():
     assert candidates['Gp2Volumes'][0]['CurrentType'] == 'gp2'
 
 
-@mock_aws
-def test_get_ebs_optimization_candidates_api_error():
+def test_get_ebs_optimization_candidates_api_error(mock_get_client):
     """Tests handling of describe_volumes errors."""
-    with patch('src.data_fetcher.get_client') as mock_get_client:
-        mock_ec2 = Mock()
-        mock_ec2.get_paginator.side_effect = Exception("DescribeVolumes Error")
-        mock_get_client.return_value = mock_ec2
+    mock_ec2 = Mock()
+    mock_ec2.get_paginator.side_effect = Exception("DescribeVolumes Error")
+    mock_get_client.return_value = mock_ec2
 
-        candidates = get_ebs_optimization_candidates(region=AWS_REGION)
-        assert candidates is None
+    candidates = get_ebs_optimization_candidates(region=AWS_REGION)
+    assert candidates is None
 
 
 # --- Test get_daily_cost_history ---
 
-@mock_aws
-def test_get_daily_cost_history_success():
+def test_get_daily_cost_history_success(mock_get_client):
     """Tests successful daily cost history fetching."""
     mock_response = {
         'ResultsByTime': [
@@ -473,31 +676,77 @@ def test_get_daily_cost_history_success():
         ],
         'ResponseMetadata': {}
     }
-    with patch('src.data_fetcher.get_client') as mock_get_client:
-        mock_ce = Mock()
-        mock_ce.get_cost_and_usage.return_value = mock_response
-        mock_get_client.return_value = mock_ce
-
-        history = get_daily_cost_history(days=3)
-
-        assert history is not None
-        assert len(history) == 3
-        assert history['2024-01-01'] == 10.50
-        assert history['2024-01-02'] == 12.75
-        assert history['2024-01-03'] == 0.00
-        mock_ce.get_cost_and_usage.assert_called_once()
-        # Check granularity was DAILY
-        call_args, call_kwargs = mock_ce.get_cost_and_usage.call_args
-        assert call_kwargs.get('Granularity') == 'DAILY'
-
-
-@mock_aws
-def test_get_daily_cost_history_failure():
-    """Tests handling errors during daily cost history fetching."""
-    with patch('src.data_fetcher.get_client') as mock_get_client:
-        mock_ce = Mock()
-        mock_ce.get_cost_and_usage.side_effect = Exception("CE History Error")
-        mock_get_client.return_value = mock_ce
+    mock_ce = Mock()
+    mock_ce.get_cost_and_usage.return_value = mock_response
+    mock_get_client.return_value = mock_ce
+
+    history = get_daily_cost_history(days=3)
+
+    assert history is not None
+    assert len(history) == 3
+    assert history['2024-01-01'] == 10.50
+    assert history['2024-01-02'] == 12.75
+    assert history['2024-01-03'] == 0.00
+    mock_ce.get_cost_and_usage.assert_called_once()
+    # Check granularity was DAILY
+    call_args, call_kwargs = mock_ce.get_cost_and_usage.call_args
+    assert call_kwargs.get('Granularity') == 'DAILY'
+
+
+def test_get_daily_cost_history_paginated(mock_get_client):
+    """Tests that daily costs from every NextPageToken page are kept."""
+    def day(date, amount):
+        return {'TimePeriod': {'Start': date}, 'Total': {'UnblendedCost': {'Amount': amount}}}
+    mock_ce = mock_get_client.return_value
+    mock_ce.get_cost_and_usage.side_effect = [
+        {'ResultsByTime': [day('2024-01-01', '1.00'), day('2024-01-02', '2.00')], 'NextPageToken': 'page-2'},
+        {'ResultsByTime': [day('2024-01-03', '3.00')]},
+    ]
+
+    history = get_daily_cost_history(days=3)
+
+    assert history == {'2024-01-01': 1.0, '2024-01-02': 2.0, '2024-01-03': 3.0}
+    assert mock_ce.get_cost_and_usage.call_count == 2
+    assert mock_ce.get_cost_and_usage.call_args.kwargs['NextPageToken'] == 'page-2'
+
+
+def test_get_daily_cost_history_sorts_out_of_order_days(mock_get_client):
+    """Tests that days are still returned in date order if Cost Explorer returns them unordered."""
+    mock_response = {
+        'ResultsByTime': [
+            {'TimePeriod': {'Start': day}, 'Total': {'UnblendedCost': {'Amount': '1.00'}}}
+            for day in ('2024-01-02', '2024-01-01', '2024-01-03')
+        ]
+    }
+    mock_get_client.return_value.get_cost_and_usage.return_value = mock_response
+    history = get_daily_cost_history(days=3)
+
+    assert list(history) == ['2024-01-01', '2024-01-02', '2024-01-03']
 
-        history = get_daily_cost_history(days=5)
-        assert history is None
\ No newline at end of file
+
+def test_get_daily_cost_history_failure(mock_get_client):
+    """Tests handling errors during daily cost history fetching."""
+    mock_ce = Mock()
+    mock_ce.get_cost_and_usage.side_effect = Exception("CE History Error")
+    mock_get_client.return_value = mock_ce
+
+    history = get_daily_cost_history(days=5)
+    assert history is None
+
+# --- Test fetch_all ---
+
+@patch('src.data_fetcher.get_untagged_resources')
+@patch('src.data_fetcher.get_idle_ec2_instances')
+@patch('src.data_fetcher.get_cost_by_service')
+def test_fetch_all(mock_get_costs, mock_get_idle, mock_get_untagged):
+    """Tests that fetch_all runs the three fetchers and collects their results, including failures."""
+    mock_get_costs.return_value = {'EC2': 10.0}
+    mock_get_idle.return_value = None # Simulate a failed fetch
+    mock_get_untagged.return_value = {'Instances': [], 'Volumes': []}
+
+    results = fetch_all(days=14, region='eu-west-1')
+
+    assert results == {'costs': {'EC2': 10.0}, 'idle': None, 'untagged': {'Instances': [], 'Volumes': []}}
+    mock_get_costs.assert_called_once_with(14)
+    mock_get_idle.assert_called_once_with('eu-west-1')
+    mock_get_untagged.assert_called_once_with(None, 'eu-west-1')
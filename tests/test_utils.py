@@ -1,27 +1,31 @@
+import threading
 import pytest
-from src.utils import _check_missing_tags # Assuming src.utils.py is in the root
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from src.utils import _check_missing_tags, _missing_tags_checker, ttl_cache, PartialResult # Assuming src.utils.py is in the root
 
 # Test cases for _check_missing_tags
 # Parameters: (resource_tags_list, required_tags_set, expected_missing_list)
+# Required tags are frozensets, the form get_untagged_resources normalizes to once per call
 check_tags_test_cases = [
     # Case 1: All required tags present
-    ([{'Key': 'Project', 'Value': 'A'}, {'Key': 'Owner', 'Value': 'B'}], {'Project', 'Owner'}, []),
+    ([{'Key': 'Project', 'Value': 'A'}, {'Key': 'Owner', 'Value': 'B'}], frozenset({'Project', 'Owner'}), []),
     # Case 2: One required tag missing
-    ([{'Key': 'Project', 'Value': 'A'}], {'Project', 'Owner'}, ['Owner']),
+    ([{'Key': 'Project', 'Value': 'A'}], frozenset({'Project', 'Owner'}), ['Owner']),
     # Case 3: Other tags present, one required missing
-    ([{'Key': 'Project', 'Value': 'A'}, {'Key': 'Name', 'Value': 'Test'}], {'Project', 'Owner'}, ['Owner']),
+    ([{'Key': 'Project', 'Value': 'A'}, {'Key': 'Name', 'Value': 'Test'}], frozenset({'Project', 'Owner'}), ['Owner']),
     # Case 4: All required tags missing (other tags present)
-    ([{'Key': 'Name', 'Value': 'Test'}], {'Project', 'Owner'}, ['Project', 'Owner']),
+    ([{'Key': 'Name', 'Value': 'Test'}], frozenset({'Project', 'Owner'}), ['Project', 'Owner']),
     # Case 5: Resource has no tags at all
-    ([], {'Project', 'Owner'}, ['Project', 'Owner']),
+    ([], frozenset({'Project', 'Owner'}), ['Project', 'Owner']),
     # Case 6: Resource tags list is None
-    (None, {'Project', 'Owner'}, ['Project', 'Owner']),
+    (None, frozenset({'Project', 'Owner'}), ['Project', 'Owner']),
     # Case 7: Required tags set is empty
-    ([{'Key': 'Project', 'Value': 'A'}], set(), []),
+    ([{'Key': 'Project', 'Value': 'A'}], frozenset(), []),
     # Case 8: Both resource tags and required tags are empty
-    ([], set(), []),
+    ([], frozenset(), []),
     # Case 9: Case sensitivity check (should be case-sensitive)
-    ([{'Key': 'project', 'Value': 'A'}], {'Project', 'Owner'}, ['Project', 'Owner']),
+    ([{'Key': 'project', 'Value': 'A'}], frozenset({'Project', 'Owner'}), ['Project', 'Owner']),
 ]
 
 @pytest.mark.parametrize("resource_tags, required_tags, expected_missing", check_tags_test_cases)
@@ -29,4 +33,122 @@ def test_check_missing_tags(resource_tags, required_tags, expected_missing):
     """Tests the _check_missing_tags helper function with various inputs."""
     missing = _check_missing_tags(resource_tags, required_tags)
     # Sort lists before comparing to handle potential order differences
-    assert sorted(missing) == sorted(expected_missing)
\ No newline at end of file
+    assert sorted(missing) == sorted(expected_missing)
+
+# Tests for the ttl_cache decorator
+
+def test_ttl_cache_hit_and_expiry():
+    """Tests that results are reused within the TTL and refetched after it expires."""
+    fetch = Mock(return_value={'EC2': 1.0})
+    cached_fetch = ttl_cache(60)(fetch)
+
+    with patch('src.utils.time.monotonic', return_value=1000.0):
+        assert cached_fetch(region='us-east-1') == {'EC2': 1.0}
+        assert cached_fetch(region='us-east-1') == {'EC2': 1.0}
+    assert fetch.call_count == 1
+
+    with patch('src.utils.time.monotonic', return_value=1061.0): # TTL elapsed
+        cached_fetch(region='us-east-1')
+    assert fetch.call_count == 2
+
+def test_ttl_cache_unhashable_args_and_none():
+    """Tests that list arguments are accepted and None (failure) results are not cached."""
+    fetch = Mock(return_value=None)
+    cached_fetch = ttl_cache(60)(fetch)
+
+    assert cached_fetch(required_tags=['Project', 'Owner']) is None
+    assert cached_fetch(required_tags=['Project', 'Owner']) is None
+    assert fetch.call_count == 2
+
+    fetch.return_value = {'Instances': [], 'Volumes': []}
+    cached_fetch(required_tags=['Project', 'Owner'])
+    cached_fetch(required_tags=['Project', 'Owner'])
+    cached_fetch.cache_clear()
+    cached_fetch(required_tags=['Project', 'Owner'])
+    assert fetch.call_count == 4
+
+def test_ttl_cache_skips_partial_results():
+    """Tests that a PartialResult is returned to the caller but not cached, so the next call refetches."""
+    fetch = Mock(return_value=PartialResult({'Instances': [], 'Volumes': []}))
+    cached_fetch = ttl_cache(60)(fetch)
+
+    assert cached_fetch(region='us-east-1') == {'Instances': [], 'Volumes': []}
+    fetch.return_value = {'Instances': [], 'Volumes': [{'ResourceId': 'vol-1'}]}
+    assert cached_fetch(region='us-east-1')['Volumes'] == [{'ResourceId': 'vol-1'}]
+    cached_fetch(region='us-east-1')
+    assert fetch.call_count == 2
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Tests that the cache is bounded by maxsize and evicts the least recently used entry."""
+    fetch = Mock(side_effect=lambda days: {'days': days})
+    cached_fetch = ttl_cache(60, maxsize=2)(fetch)
+
+    cached_fetch(days=7)
+    cached_fetch(days=30)
+    cached_fetch(days=7) # Hit; 30 becomes the least recently used entry
+    cached_fetch(days=60) # Evicts 30
+    assert fetch.call_count == 3
+
+    cached_fetch(days=7)
+    assert fetch.call_count == 3
+    cached_fetch(days=30)
+    assert fetch.call_count == 4
+
+def test_ttl_cache_single_flight():
+    """Tests that concurrent callers of one key share a single in-flight call, including its errors."""
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_fetch(region):
+        entered.set()
+        release.wait(5)
+        return {'region': region}
+
+    fetch = Mock(side_effect=slow_fetch)
+    cached_fetch = ttl_cache(60)(fetch)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(cached_fetch, 'us-east-1')
+        entered.wait(5)
+        waiters = [executor.submit(cached_fetch, 'us-east-1') for _ in range(3)]
+        threading.Event().wait(0.05) # Let the waiters reach the in-flight call
+        release.set()
+        results = [first.result()] + [w.result() for w in waiters]
+    assert results == [{'region': 'us-east-1'}] * 4
+    assert fetch.call_count == 1
+
+    entered.clear(); release.clear()
+    fetch.side_effect = lambda region: (entered.set(), release.wait(5), 1 / 0)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(cached_fetch, 'eu-west-1')
+        entered.wait(5)
+        waiter = executor.submit(cached_fetch, 'eu-west-1')
+        threading.Event().wait(0.05)
+        release.set()
+        for future in (first, waiter):
+            with pytest.raises(ZeroDivisionError):
+                future.result()
+    assert fetch.call_count == 2 # The error was shared, not retried by the waiter
+
+def test_check_missing_tags_sorted_output():
+    """Tests that missing tags are returned in a stable, sorted order."""
+    required = frozenset({'Project', 'Owner', 'CostCenter'})
+    assert _check_missing_tags(None, required) == ['CostCenter', 'Owner', 'Project']
+    assert _check_missing_tags([{'Key': 'Owner', 'Value': 'a'}], required) == ['CostCenter', 'Project']
+
+def test_missing_tags_checker_is_cached_per_key_set():
+    """Tests that one specialized checker is built per required-tag set and reused."""
+    check = _missing_tags_checker(frozenset({'Project', 'Owner'}))
+    assert _missing_tags_checker(frozenset({'Owner', 'Project'})) is check
+    assert check([{'Key': 'Owner', 'Value': 'a'}, {'Key': 'Name', 'Value': 'b'}]) == ['Project']
+    assert check([{'Key': 'Project', 'Value': 'a'}, {'Key': 'Owner', 'Value': 'b'}]) == []
+
+def test_missing_tags_checker_stops_once_all_found():
+    """Tests that the checker stops reading tags once every required key has been seen."""
+    check = _missing_tags_checker(frozenset({'Project', 'Owner'}))
+
+    def tags():
+        yield {'Key': 'Owner', 'Value': 'a'}
+        yield {'Key': 'Project', 'Value': 'b'}
+        raise AssertionError("tags after the last required key were read")
+
+    assert check(tags()) == []